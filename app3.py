@@ -11,11 +11,27 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-import qrcode
-from io import BytesIO
-import base64
 import time
 import json
+import os
+import re
+from collections import defaultdict
+import numpy as np
+from geo import bounding_box, grid_clusters, points_within_km, zoom_for_radius
+from database import ConnectionPool, DATABASE_PATH
+from blob_store import BlobStore
+from migrations import migrate
+from stats import get_platform_stats, rebuild_daily_rollups, rebuild_platform_stats
+from streaks import backfill_streaks, record_donation
+from bulk_import import FOOD_TYPES, REQUIRED_FIELDS, OPTIONAL_FIELDS, import_donations, parse_upload
+from query_cache import QueryCache
+from sessions import SessionStore
+from expiry import ExpiryScheduler
+from matching import MatchingWorker
+from leaderboards import LeaderboardWorker, read_leaderboard, snapshot_leaderboards
+from routing import plan_route
+from qr_codes import QRCodeCache, new_payload, regenerate_payload
+from notifications import enqueue, enqueue_many, queue_donation_alerts, OutboxWorker, email_service_from_env, outbox_counts, retry_dead_letters
 
 # Page Configuration
 st.set_page_config(
@@ -392,93 +408,15 @@ st.markdown(get_custom_css(st.session_state.theme), unsafe_allow_html=True)
 # Database Setup with enhanced schema
 @st.cache_resource
 def init_database():
-    conn = sqlite3.connect('food_donation.db', check_same_thread=False)
+    pool = ConnectionPool(DATABASE_PATH)
+    with pool.connection() as conn:
+        create_schema(conn)
+    return pool
+
+def create_schema(conn):
+    migrate(conn)
     c = conn.cursor()
     
-    # Users table
-    c.execute('''CREATE TABLE IF NOT EXISTS users (
-        user_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        email TEXT UNIQUE NOT NULL,
-        password_hash TEXT NOT NULL,
-        full_name TEXT NOT NULL,
-        phone TEXT,
-        role TEXT CHECK(role IN ('donor', 'ngo', 'admin')),
-        status TEXT DEFAULT 'active',
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        verified INTEGER DEFAULT 0,
-        profile_pic TEXT,
-        total_donations INTEGER DEFAULT 0,
-        streak_days INTEGER DEFAULT 0,
-        last_donation_date DATE
-    )''')
-    
-    # NGO Profiles
-    c.execute('''CREATE TABLE IF NOT EXISTS ngo_profiles (
-        ngo_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER UNIQUE,
-        organization_name TEXT NOT NULL,
-        registration_number TEXT UNIQUE,
-        address TEXT NOT NULL,
-        latitude REAL,
-        longitude REAL,
-        verified INTEGER DEFAULT 0,
-        capacity INTEGER DEFAULT 50,
-        total_pickups INTEGER DEFAULT 0,
-        rating REAL DEFAULT 5.0,
-        FOREIGN KEY (user_id) REFERENCES users(user_id)
-    )''')
-    
-    # Donations table with image support
-    c.execute('''CREATE TABLE IF NOT EXISTS donations (
-        donation_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        donor_id INTEGER NOT NULL,
-        food_name TEXT NOT NULL,
-        quantity TEXT NOT NULL,
-        food_type TEXT,
-        expiry_time TIMESTAMP NOT NULL,
-        location TEXT NOT NULL,
-        latitude REAL NOT NULL,
-        longitude REAL NOT NULL,
-        image_data TEXT,
-        description TEXT,
-        status TEXT DEFAULT 'pending',
-        qr_code TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        collected_at TIMESTAMP,
-        view_count INTEGER DEFAULT 0,
-        FOREIGN KEY (donor_id) REFERENCES users(user_id)
-    )''')
-    
-    # Requests table
-    c.execute('''CREATE TABLE IF NOT EXISTS requests (
-        request_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        donation_id INTEGER NOT NULL,
-        ngo_id INTEGER NOT NULL,
-        status TEXT DEFAULT 'pending',
-        message TEXT,
-        requested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        accepted_at TIMESTAMP,
-        collected_at TIMESTAMP,
-        feedback TEXT,
-        rating INTEGER,
-        FOREIGN KEY (donation_id) REFERENCES donations(donation_id),
-        FOREIGN KEY (ngo_id) REFERENCES ngo_profiles(ngo_id)
-    )''')
-    
-    # Success Stories
-    c.execute('''CREATE TABLE IF NOT EXISTS success_stories (
-        story_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        donation_id INTEGER,
-        ngo_id INTEGER,
-        title TEXT NOT NULL,
-        story TEXT NOT NULL,
-        impact_meals INTEGER,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        featured INTEGER DEFAULT 0,
-        FOREIGN KEY (donation_id) REFERENCES donations(donation_id),
-        FOREIGN KEY (ngo_id) REFERENCES ngo_profiles(ngo_id)
-    )''')
-    
     # Create admin user
     admin_email = "admin@fooddonation.com"
     admin_pass = hash_password("admin123")
@@ -490,7 +428,80 @@ def init_database():
         pass
     
     conn.commit()
-    return conn
+
+@st.cache_resource
+def get_blob_store():
+    return BlobStore('media')
+
+@st.cache_resource
+def get_qr_cache():
+    return QRCodeCache()
+
+@st.cache_resource
+def get_query_cache():
+    return QueryCache()
+
+@st.cache_resource
+def get_session_store():
+    return SessionStore()
+
+def _outbox_worker(pool):
+    # Without SMTP credentials notifications stay queued until email is configured
+    email_service = email_service_from_env()
+    return OutboxWorker(pool, email_service) if email_service.enabled else None
+
+# Background workers keyed by the env var that moves each one out of process; set it to
+# "external" when running notifications.py, expiry.py, matching.py or leaderboards.py separately
+BACKGROUND_WORKERS = {
+    'OUTBOX_WORKER': _outbox_worker,
+    'EXPIRY_SCHEDULER': ExpiryScheduler,
+    'MATCHING_WORKER': MatchingWorker,
+    'LEADERBOARD_WORKER': LeaderboardWorker,
+}
+
+@st.cache_resource
+def start_worker(env_var):
+    # One instance of each worker per server process
+    if os.environ.get(env_var, 'thread') != 'thread':
+        return None
+    worker = BACKGROUND_WORKERS[env_var](init_database())
+    return worker.start() if worker else None
+
+def cached_query(conn, sql, params=(), tables=()):
+    # Read-only aggregates shared across sessions until one of `tables` is written
+    return get_query_cache().fetchall(conn, sql, params, tables)
+
+# Keyset Pagination
+PAGE_SIZES = [10, 25, 50, 100]
+
+def get_page_cursor(key, filters):
+    # One cursor per visited page; changing any filter starts again from page 1
+    state = st.session_state.get(f"pager_{key}")
+    if state is None or state['filters'] != filters:
+        state = {'filters': filters, 'cursors': [None]}
+        st.session_state[f"pager_{key}"] = state
+    return state['cursors'][-1]
+
+def show_page_controls(key, rows, page_size, cursor_of):
+    # rows is the page fetched with LIMIT page_size + 1; the extra row only signals a next page
+    state = st.session_state[f"pager_{key}"]
+    has_next = len(rows) > page_size
+    if not has_next and len(state['cursors']) == 1:
+        return
+    
+    # Callbacks move the cursor before the next run, so no extra st.rerun() is needed
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if len(state['cursors']) > 1:
+            st.button("⬅️ Previous", key=f"{key}_prev", use_container_width=True,
+                      on_click=state['cursors'].pop)
+    with col2:
+        st.markdown(f"<p style='text-align: center; margin-top: 8px;'>Page {len(state['cursors'])}</p>",
+                    unsafe_allow_html=True)
+    with col3:
+        if has_next:
+            st.button("Next ➡️", key=f"{key}_next", use_container_width=True,
+                      on_click=state['cursors'].append, args=(cursor_of(rows[page_size - 1]),))
 
 # Utility Functions
 def hash_password(password):
@@ -499,43 +510,31 @@ def hash_password(password):
 def verify_password(password, password_hash):
     return hash_password(password) == password_hash
 
-def generate_qr_code(data):
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr.add_data(data)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
-    
-    buffered = BytesIO()
-    img.save(buffered, format="PNG")
-    img_str = base64.b64encode(buffered.getvalue()).decode()
-    return img_str
+def request_pickup(conn, donation_id, ngo_id, org_name):
+    c = conn.cursor()
+    c.execute('''SELECT d.food_name, u.email FROM donations d
+                 JOIN users u ON d.donor_id = u.user_id
+                 WHERE d.donation_id = ?''', (donation_id,))
+    food_name, donor_email = c.fetchone()
+    
+    c.execute('''INSERT INTO requests (donation_id, ngo_id, message)
+                 VALUES (?, ?, ?)''',
+              (donation_id, ngo_id, f"Pickup request from {org_name}"))
+    # A requested donation is no longer up for matching
+    c.execute("DELETE FROM match_suggestions WHERE donation_id = ?", (donation_id,))
+    enqueue(conn, 'send_request_received_notification',
+            donor_email=donor_email, ngo_name=org_name, donation_name=food_name)
+    conn.commit()
 
-def image_to_base64(uploaded_file):
+def store_uploaded_image(uploaded_file):
     if uploaded_file is not None:
-        bytes_data = uploaded_file.getvalue()
-        return base64.b64encode(bytes_data).decode()
+        return get_blob_store().put(uploaded_file.getvalue())
     return None
 
-def get_user_badges(conn, user_id):
-    c = conn.cursor()
-    c.execute("SELECT total_donations, streak_days FROM users WHERE user_id = ?", (user_id,))
-    result = c.fetchone()
-    
-    badges = []
-    if result:
-        total, streak = result[0] or 0, result[1] or 0
-        
-        if total >= 50:
-            badges.append(("🏆", "Gold Donor", "badge-gold"))
-        elif total >= 20:
-            badges.append(("🥈", "Silver Donor", "badge-silver"))
-        elif total >= 5:
-            badges.append(("🥉", "Bronze Donor", "badge-bronze"))
-        
-        if streak >= 7:
-            badges.append(("🔥", f"{streak} Day Streak", "badge-gold"))
-        
-    return badges
+def to_fts_query(search_term):
+    # Quote every word so user input can never inject FTS5 syntax; prefix-match the words
+    words = re.findall(r"\w+", search_term or "")
+    return " ".join(f'"{word}"*' for word in words)
 
 # Authentication Functions
 def register_user(conn, email, password, full_name, phone, role):
@@ -545,8 +544,10 @@ def register_user(conn, email, password, full_name, phone, role):
         c.execute('''INSERT INTO users (email, password_hash, full_name, phone, role)
                      VALUES (?, ?, ?, ?, ?)''',
                   (email, password_hash, full_name, phone, role))
+        user_id = c.lastrowid
+        enqueue(conn, 'send_welcome_email', to_email=email, name=full_name, role=role)
         conn.commit()
-        return True, c.lastrowid
+        return True, user_id
     except sqlite3.IntegrityError:
         return False, "Email already exists"
 
@@ -581,14 +582,10 @@ def show_home_page(conn):
     col1, col2, col3, col4 = st.columns(4)
     
     c = conn.cursor()
-    c.execute("SELECT COUNT(*) FROM donations WHERE status='completed'")
-    total_donations = c.fetchone()[0]
-    
-    c.execute("SELECT COUNT(DISTINCT user_id) FROM users WHERE role='ngo' AND verified=1")
-    total_ngos = c.fetchone()[0]
-    
-    c.execute("SELECT COUNT(DISTINCT user_id) FROM users WHERE role='donor'")
-    total_donors = c.fetchone()[0]
+    stats = get_platform_stats(conn)
+    total_donations = stats['donations_completed']
+    total_ngos = stats['verified_ngos']
+    total_donors = stats['users_donor']
     
     meals_saved = total_donations * 15
     food_saved_kg = total_donations * 5
@@ -729,11 +726,12 @@ def show_home_page(conn):
         st.info("💡 No active donations right now. Be the first to donate!")
 
 # Enhanced Donor Dashboard
-def show_donor_dashboard(conn, user_id):
+def show_donor_dashboard(conn, user):
     st.title("🎁 Donor Dashboard")
+    user_id = user['user_id']
     
     # User badges and stats
-    badges = get_user_badges(conn, user_id)
+    badges = user['badges']
     if badges:
         badge_html = "".join([f"<span class='badge {badge[2]}'>{badge[0]} {badge[1]}</span>" for badge in badges])
         st.markdown(f"""
@@ -754,8 +752,7 @@ def show_donor_dashboard(conn, user_id):
             with col1:
                 food_name = st.text_input("🍱 Food Item Name *", placeholder="e.g., Biryani, Pizza, Rice")
                 quantity = st.text_input("📦 Quantity *", placeholder="e.g., 50 plates, 10 kg")
-                food_type = st.selectbox("🍽️ Food Type *", 
-                    ["Cooked Food", "Raw Food", "Packaged Food", "Fruits/Vegetables", "Bakery Items"])
+                food_type = st.selectbox("🍽️ Food Type *", FOOD_TYPES)
             
             with col2:
                 expiry_date = st.date_input("📅 Expiry Date", 
@@ -786,65 +783,125 @@ def show_donor_dashboard(conn, user_id):
                     expiry_datetime = datetime.combine(expiry_date, expiry_time)
                     
                     c = conn.cursor()
-                    qr_data = f"DONATION-{datetime.now().strftime('%Y%m%d%H%M%S')}-{user_id}"
-                    qr_code = generate_qr_code(qr_data)
+                    # The QR image is rendered when first viewed, not on the submit path
+                    qr_payload = new_payload(user_id)
                     
-                    image_data = image_to_base64(uploaded_image) if uploaded_image else None
+                    image_hash = store_uploaded_image(uploaded_image)
                     
                     c.execute('''INSERT INTO donations 
-                                (donor_id, food_name, quantity, food_type, expiry_time, location, latitude, longitude, description, qr_code, image_data)
+                                (donor_id, food_name, quantity, food_type, expiry_time, location, latitude, longitude, description, qr_payload, image_hash)
                                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                             (user_id, food_name, quantity, food_type, expiry_datetime, location, latitude, longitude, description, qr_code, image_data))
+                             (user_id, food_name, quantity, food_type, expiry_datetime, location, latitude, longitude, description, qr_payload, image_hash))
+                    alerted = queue_donation_alerts(conn, c.lastrowid)
                     
-                    # Update user stats
-                    c.execute("UPDATE users SET total_donations = total_donations + 1, last_donation_date = ? WHERE user_id = ?",
-                             (datetime.now().date(), user_id))
+                    # Update user stats; the streak advances against last_donation_date without reading history
+                    record_donation(conn, user_id, datetime.now().date())
                     
                     conn.commit()
+                    get_session_store().invalidate_user(user_id)
                     
-                    st.success("✅ Donation posted successfully! NGOs will be notified.")
+                    if alerted:
+                        st.success(f"✅ Donation posted successfully! {alerted} nearby NGOs will be notified.")
+                    else:
+                        st.success("✅ Donation posted successfully! No verified NGOs with spare capacity nearby yet.")
                     st.balloons()
                     st.rerun()
                 else:
                     st.error("⚠️ Please fill all required fields (*)")
+        
+        # Many items at once: validated together and inserted in one transaction
+        with st.expander("📦 Bulk Import (CSV / JSON)"):
+            columns = REQUIRED_FIELDS + OPTIONAL_FIELDS
+            st.caption(f"Columns: {', '.join(columns)} · expiry_time as YYYY-MM-DD HH:MM · "
+                       f"food_type one of {', '.join(FOOD_TYPES)}")
+            st.download_button("📄 Download CSV Template", ",".join(columns) + "\n", "donations_template.csv", "text/csv")
+            
+            bulk_file = st.file_uploader("Upload donations", type=['csv', 'json'], key="bulk_import_file")
+            if bulk_file and st.button("📥 Import Donations", key="bulk_import", use_container_width=True):
+                try:
+                    records = parse_upload(bulk_file.name, bulk_file.getvalue())
+                except ValueError as e:
+                    st.error(f"❌ Could not read {bulk_file.name}: {e}")
+                else:
+                    imported, alerted, errors = import_donations(conn, user_id, records)
+                    if imported:
+                        get_session_store().invalidate_user(user_id)
+                        if alerted:
+                            st.success(f"✅ Imported {imported} donations. {alerted} NGO alerts will be sent to nearby NGOs.")
+                        else:
+                            st.success(f"✅ Imported {imported} donations. No verified NGOs with spare capacity nearby yet.")
+                    if errors:
+                        st.warning(f"⚠️ {len(errors)} rows were skipped")
+                        st.dataframe(pd.DataFrame(errors, columns=['Row', 'Problem']), use_container_width=True, hide_index=True)
     
     with tab2:
         st.subheader("Your Posted Donations")
         
         # Filter options
-        status_filter = st.selectbox("Filter by Status", ["All", "pending", "accepted", "completed"])
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            status_filter = st.selectbox("Filter by Status", ["All", "pending", "accepted", "completed", "expired"])
+        with col2:
+            page_size = st.selectbox("Per Page", PAGE_SIZES, key="my_donations_page_size")
+        
+        cursor = get_page_cursor("my_donations", (status_filter, page_size))
+        
+        query = '''SELECT donation_id, food_name, quantity, location, status, created_at, qr_payload, expiry_time, image_hash, qr_hash
+                   FROM donations WHERE donor_id = ?'''
+        params = [user_id]
+        
+        if status_filter != "All":
+            query += " AND status = ?"
+            params.append(status_filter)
+        
+        if cursor:
+            query += " AND (created_at, donation_id) < (?, ?)"
+            params.extend(cursor)
+        
+        query += " ORDER BY created_at DESC, donation_id DESC LIMIT ?"
+        params.append(page_size + 1)
         
         c = conn.cursor()
-        if status_filter == "All":
-            c.execute('''SELECT donation_id, food_name, quantity, location, status, created_at, qr_code, expiry_time, image_data
-                         FROM donations WHERE donor_id = ? ORDER BY created_at DESC''', (user_id,))
-        else:
-            c.execute('''SELECT donation_id, food_name, quantity, location, status, created_at, qr_code, expiry_time, image_data
-                         FROM donations WHERE donor_id = ? AND status = ? ORDER BY created_at DESC''', (user_id, status_filter))
-        donations = c.fetchall()
+        c.execute(query, params)
+        page_rows = c.fetchall()
+        donations = page_rows[:page_size]
         
         if donations:
+            # Load pickup requests for every listed donation in one query
+            placeholders = ",".join("?" * len(donations))
+            c.execute(f'''SELECT r.donation_id, r.request_id, r.status, n.organization_name, u.phone, u.email
+                          FROM requests r
+                          JOIN ngo_profiles n ON r.ngo_id = n.ngo_id
+                          JOIN users u ON n.user_id = u.user_id
+                          WHERE r.donation_id IN ({placeholders})
+                          ORDER BY r.request_id''', [don[0] for don in donations])
+            requests_by_donation = defaultdict(list)
+            for row in c.fetchall():
+                requests_by_donation[row[0]].append(row[1:])
+            
+            c.execute(f'''SELECT m.donation_id, n.organization_name, m.distance_km
+                          FROM match_suggestions m
+                          JOIN ngo_profiles n ON m.ngo_id = n.ngo_id
+                          WHERE m.donation_id IN ({placeholders})''', [don[0] for don in donations])
+            suggestion_by_donation = {row[0]: row[1:] for row in c.fetchall()}
+            
             for don in donations:
                 status_emoji = {"pending": "⏳", "accepted": "✅", "completed": "🎉", "expired": "❌"}
                 with st.expander(f"{status_emoji.get(don[4], '📋')} {don[1]} - {don[2]} ({don[4].upper()})"):
                     col1, col2 = st.columns([2, 1])
                     
                     with col1:
-                        if don[8]:  # If image exists
-                            st.image(f"data:image/png;base64,{don[8]}", width=300)
-                        
                         st.write(f"**📍 Location:** {don[3]}")
                         st.write(f"**📅 Posted:** {don[5]}")
                         st.write(f"**⏰ Expires:** {don[7]}")
                         st.write(f"**📊 Status:** {don[4].upper()}")
                         
+                        suggestion = suggestion_by_donation.get(don[0])
+                        if suggestion and don[4] == 'pending':
+                            st.write(f"**🤝 Suggested NGO:** {suggestion[0]} (~{suggestion[1]:.1f} km away)")
+                        
                         # Show requests
-                        c.execute('''SELECT r.request_id, r.status, n.organization_name, u.phone, u.email
-                                    FROM requests r
-                                    JOIN ngo_profiles n ON r.ngo_id = n.ngo_id
-                                    JOIN users u ON n.user_id = u.user_id
-                                    WHERE r.donation_id = ?''', (don[0],))
-                        requests = c.fetchall()
+                        requests = requests_by_donation[don[0]]
                         
                         if requests:
                             st.write("**📞 Pickup Requests:**")
@@ -863,6 +920,12 @@ def show_donor_dashboard(conn, user_id):
                                             c.execute("UPDATE requests SET status='accepted', accepted_at=? WHERE request_id=?",
                                                      (datetime.now(), req[0]))
                                             c.execute("UPDATE donations SET status='accepted' WHERE donation_id=?", (don[0],))
+                                            c.execute("SELECT email, phone FROM users WHERE user_id=?", (user_id,))
+                                            donor_email, donor_phone = c.fetchone()
+                                            enqueue(conn, 'send_request_accepted_notification', ngo_email=req[4],
+                                                    donation_details={'food_name': don[1], 'quantity': don[2],
+                                                                      'location': don[3], 'expiry_time': don[7]},
+                                                    donor_contact=f"{donor_email} | {donor_phone or 'N/A'}")
                                             conn.commit()
                                             st.success("Request accepted!")
                                             st.rerun()
@@ -876,26 +939,38 @@ def show_donor_dashboard(conn, user_id):
                             st.info("No pickup requests yet")
                     
                     with col2:
-                        if don[6]:
-                            st.image(f"data:image/png;base64,{don[6]}", caption="QR Code", width=150)
-                            st.download_button("📥 Download QR", 
-                                data=base64.b64decode(don[6]),
-                                file_name=f"donation_{don[0]}.png",
-                                mime="image/png",
-                                key=f"qr_{don[0]}")
+                        # Expander bodies always run, so blobs are only read once the donor asks for them
+                        if st.checkbox("📸 Show photo & QR", key=f"media_{don[0]}"):
+                            image_bytes = get_blob_store().get(don[8])
+                            if image_bytes:
+                                st.image(image_bytes, width=200)
+                            
+                            # Donations posted before QR payloads were stored still have a PNG blob
+                            qr_bytes = get_qr_cache().png(don[0], don[6]) if don[6] else get_blob_store().get(don[9])
+                            if qr_bytes:
+                                st.image(qr_bytes, caption="QR Code", width=150)
+                                st.download_button("📥 Download QR", 
+                                    data=qr_bytes,
+                                    file_name=f"donation_{don[0]}.png",
+                                    mime="image/png",
+                                    key=f"qr_{don[0]}")
+                            if st.button("🔄 Regenerate QR", key=f"regen_qr_{don[0]}"):
+                                regenerate_payload(conn, don[0], user_id)
+                                get_qr_cache().invalidate(don[0])
+                                st.rerun()
         else:
             st.info("📭 No donations found. Create your first donation!")
+        
+        show_page_controls("my_donations", page_rows, page_size, lambda don: (don[5], don[0]))
     
     with tab3:
         st.subheader("Your Impact Dashboard")
         
-        c = conn.cursor()
-        c.execute('''SELECT COUNT(*), 
+        total, completed, pending, accepted = cached_query(conn, '''SELECT COUNT(*), 
                             SUM(CASE WHEN status='completed' THEN 1 ELSE 0 END),
                             SUM(CASE WHEN status='pending' THEN 1 ELSE 0 END),
                             SUM(CASE WHEN status='accepted' THEN 1 ELSE 0 END)
-                     FROM donations WHERE donor_id = ?''', (user_id,))
-        total, completed, pending, accepted = c.fetchone()
+                     FROM donations WHERE donor_id = ?''', (user_id,), tables=("donations",))[0]
         
         col1, col2, col3, col4 = st.columns(4)
         
@@ -956,11 +1031,11 @@ def show_donor_dashboard(conn, user_id):
         st.markdown("---")
         st.subheader("📈 Your Activity Over Time")
         
-        c.execute('''SELECT DATE(created_at) as date, COUNT(*) as count
-                     FROM donations WHERE donor_id = ?
-                     GROUP BY DATE(created_at)
-                     ORDER BY date DESC LIMIT 30''', (user_id,))
-        chart_data = c.fetchall()
+        # Charts read the trigger-maintained daily rollups rather than scanning donations
+        chart_data = cached_query(conn, '''SELECT day, SUM(donations) as count
+                     FROM donor_daily WHERE donor_id = ? AND day != 'unknown'
+                     GROUP BY day HAVING count > 0
+                     ORDER BY day DESC LIMIT 30''', (user_id,), tables=("donations",))
         
         if chart_data:
             df = pd.DataFrame(chart_data, columns=['Date', 'Donations'])
@@ -970,10 +1045,9 @@ def show_donor_dashboard(conn, user_id):
             st.plotly_chart(fig, use_container_width=True)
         
         # Donation type distribution
-        c.execute('''SELECT food_type, COUNT(*) as count
-                     FROM donations WHERE donor_id = ?
-                     GROUP BY food_type''', (user_id,))
-        type_data = c.fetchall()
+        type_data = cached_query(conn, '''SELECT food_type, SUM(donations) as count
+                     FROM donor_daily WHERE donor_id = ?
+                     GROUP BY food_type HAVING count > 0''', (user_id,), tables=("donations",))
         
         if type_data:
             df_type = pd.DataFrame(type_data, columns=['Type', 'Count'])
@@ -1006,12 +1080,12 @@ def show_donor_dashboard(conn, user_id):
                 st.balloons()
 
 # Enhanced NGO Dashboard
-def show_ngo_dashboard(conn, user_id):
+def show_ngo_dashboard(conn, user):
     st.title("❤️ NGO Dashboard")
+    user_id = user['user_id']
     
     c = conn.cursor()
-    c.execute("SELECT ngo_id, organization_name, verified, total_pickups FROM ngo_profiles WHERE user_id = ?", (user_id,))
-    ngo_profile = c.fetchone()
+    ngo_profile = user['ngo_profile']
     
     if not ngo_profile:
         st.warning("⚠️ Please complete your NGO profile first.")
@@ -1040,13 +1114,14 @@ def show_ngo_dashboard(conn, user_id):
                                 VALUES (?, ?, ?, ?, ?, ?, ?)''',
                              (user_id, org_name, reg_number, address, latitude, longitude, capacity))
                     conn.commit()
+                    get_session_store().invalidate_user(user_id)
                     st.success("✅ Profile created! Waiting for admin verification.")
                     st.rerun()
                 else:
                     st.error("⚠️ Please fill all required fields")
         return
     
-    ngo_id, org_name, verified, total_pickups = ngo_profile
+    ngo_id, org_name, verified, total_pickups, ngo_lat, ngo_lon = ngo_profile
     
     if not verified:
         st.warning("⏳ Your NGO profile is pending admin verification. You'll be notified once approved.")
@@ -1068,106 +1143,207 @@ def show_ngo_dashboard(conn, user_id):
     tab1, tab2, tab3, tab4 = st.tabs(["🔍 Browse Donations", "📦 My Requests", "📊 Impact", "🗺️ Map View"])
     
     with tab1:
+        # Matching engine picks for this NGO, refreshed every few minutes
+        c.execute('''SELECT d.donation_id, d.food_name, d.quantity, d.location, d.expiry_time, m.distance_km
+                     FROM match_suggestions m
+                     JOIN donations d ON d.donation_id = m.donation_id
+                     WHERE m.ngo_id = ? AND d.status = 'pending'
+                     ORDER BY m.distance_km''', (ngo_id,))
+        suggestions = c.fetchall()
+        
+        if suggestions:
+            st.subheader("🤝 Suggested for You")
+            st.caption("Matched to your location and spare capacity")
+            for sug in suggestions:
+                col1, col2 = st.columns([4, 1])
+                with col1:
+                    st.info(f"**{sug[1]}** ({sug[2]}) · 📍 {sug[3]} · ~{sug[5]:.1f} km · ⏰ {sug[4]}")
+                with col2:
+                    if st.button("🚀 Request", key=f"suggested_{sug[0]}", use_container_width=True):
+                        request_pickup(conn, sug[0], ngo_id, org_name)
+                        st.success("✅ Request sent to donor!")
+                        st.rerun()
+            st.markdown("---")
+        
         st.subheader("Available Food Donations")
         
-        col1, col2, col3 = st.columns(3)
+        col1, col2, col3, col4 = st.columns([2, 2, 2, 1])
         with col1:
-            food_filter = st.selectbox("Filter by Type", ["All", "Cooked Food", "Raw Food", "Packaged Food", "Fruits/Vegetables", "Bakery Items"])
+            food_filter = st.selectbox("Filter by Type", ["All"] + FOOD_TYPES)
         with col2:
             distance_filter = st.slider("Max Distance (km)", 1, 50, 20)
         with col3:
             search_term = st.text_input("🔍 Search", placeholder="Search food items...")
+        with col4:
+            page_size = st.selectbox("Per Page", PAGE_SIZES, key="browse_page_size")
         
-        c.execute("SELECT latitude, longitude FROM ngo_profiles WHERE ngo_id = ?", (ngo_id,))
-        ngo_lat, ngo_lon = c.fetchone()
+        # Bounding-box lookup on the R*Tree, then an exact haversine check
+        min_lat, max_lat, min_lon, max_lon = bounding_box(ngo_lat, ngo_lon, distance_filter)
         
-        query = '''SELECT d.donation_id, d.food_name, d.quantity, d.food_type, d.location, 
-                          d.expiry_time, d.latitude, d.longitude, d.description, u.full_name, u.phone, u.email, d.image_data
-                   FROM donations d
-                   JOIN users u ON d.donor_id = u.user_id
-                   WHERE d.status = 'pending' '''
+        fts_query = to_fts_query(search_term)
+        cursor = get_page_cursor("browse", (food_filter, distance_filter, fts_query, page_size))
         
-        if food_filter != "All":
-            query += f" AND d.food_type = '{food_filter}'"
+        # Best text matches first (food name weighted above location and details), nearest next
+        score = "bm25(donations_fts, 10.0, 1.0, 2.0)" if fts_query else "0"
         
-        if search_term:
-            query += f" AND (d.food_name LIKE '%{search_term}%' OR d.description LIKE '%{search_term}%')"
+        # Only ids, coordinates and scores for the candidates in the box; full rows are loaded for one page
+        query = f'''SELECT d.donation_id, d.latitude, d.longitude, {score} AS score
+                   FROM donation_geo g
+                   JOIN donations d ON d.donation_id = g.donation_id'''
+        if fts_query:
+            query += " JOIN donations_fts f ON f.rowid = d.donation_id"
         
-        query += " ORDER BY d.created_at DESC"
+        query += '''
+                   WHERE g.min_lat >= ? AND g.max_lat <= ? AND g.min_lon >= ? AND g.max_lon <= ?
+                     AND d.status = 'pending' '''
+        params = [min_lat, max_lat, min_lon, max_lon]
         
-        c.execute(query)
-        donations = c.fetchall()
+        if food_filter != "All":
+            query += " AND d.food_type = ?"
+            params.append(food_filter)
+        
+        if fts_query:
+            query += " AND donations_fts MATCH ?"
+            params.append(fts_query)
+        
+        c.execute(query, params)
+        candidates = np.array(c.fetchall(), dtype=float).reshape(-1, 4)
+        ids, scores = candidates[:, 0].astype(np.int64), candidates[:, 3]
+        
+        # Exact distances for every candidate at once, then the radius and keyset filters as masks
+        distances, keep = points_within_km(ngo_lat, ngo_lon, candidates[:, 1], candidates[:, 2], distance_filter)
+        if cursor:
+            cursor_score, cursor_distance, cursor_id = cursor
+            keep &= (scores > cursor_score) | ((scores == cursor_score) & (
+                (distances > cursor_distance) | ((distances == cursor_distance) & (ids > cursor_id))))
+        
+        ranked = np.flatnonzero(keep)
+        ranked = ranked[np.lexsort((ids[ranked], distances[ranked], scores[ranked]))][:page_size + 1]
+        
+        page_rows = []
+        if ranked.size:
+            placeholders = ",".join("?" * ranked.size)
+            c.execute(f'''SELECT d.donation_id, d.food_name, d.quantity, d.food_type, d.location,
+                                 d.expiry_time, d.latitude, d.longitude, d.description, u.full_name, u.phone, u.email, d.image_hash,
+                                 r.status
+                          FROM donations d
+                          JOIN users u ON d.donor_id = u.user_id
+                          LEFT JOIN requests r ON r.donation_id = d.donation_id AND r.ngo_id = ?
+                          WHERE d.donation_id IN ({placeholders})''', [ngo_id] + ids[ranked].tolist())
+            rows_by_id = {row[0]: row for row in c.fetchall()}
+            # Same layout as before: distance at 13, this NGO's request status at 14, score at 15
+            page_rows = [rows_by_id[ids[i]][:13] + (float(distances[i]), rows_by_id[ids[i]][13], float(scores[i]))
+                         for i in ranked if ids[i] in rows_by_id]
+        donations = page_rows[:page_size]
         
         if donations:
             for don in donations:
-                distance = ((don[6] - ngo_lat)**2 + (don[7] - ngo_lon)**2)**0.5 * 111
+                distance = don[13]
                 
-                if distance <= distance_filter:
-                    with st.container():
-                        col1, col2 = st.columns([3, 1])
-                        
-                        with col1:
-                            st.markdown(f"""
-                            <div class='donation-card'>
-                                <h4>🍱 {don[1]} ({don[2]})</h4>
-                                <p><strong>Type:</strong> {don[3]} | <strong>Location:</strong> {don[4]}</p>
-                                <p><strong>Expires:</strong> {don[5]} | <strong>Distance:</strong> ~{distance:.1f} km</p>
-                                <p><strong>Details:</strong> {don[8] or 'No additional details'}</p>
-                                <p><strong>Contact:</strong> {don[9]} | 📧 {don[11]} | 📱 {don[10] or 'N/A'}</p>
-                            </div>
-                            """, unsafe_allow_html=True)
-                        
-                        with col2:
-                            if don[12]:  # If image exists
-                                st.image(f"data:image/png;base64,{don[12]}", width=150)
-                        
-                        c.execute("SELECT status FROM requests WHERE donation_id = ? AND ngo_id = ?", 
-                                 (don[0], ngo_id))
-                        existing_request = c.fetchone()
-                        
-                        if existing_request:
-                            st.info(f"📋 Status: {existing_request[0].upper()}")
-                        else:
-                            if st.button(f"🚀 Request Pickup", key=f"req_{don[0]}", use_container_width=True):
-                                c.execute('''INSERT INTO requests (donation_id, ngo_id, message)
-                                            VALUES (?, ?, ?)''',
-                                         (don[0], ngo_id, f"Pickup request from {org_name}"))
-                                conn.commit()
-                                st.success("✅ Request sent to donor!")
-                                st.balloons()
-                                st.rerun()
-                        
-                        st.markdown("---")
+                with st.container():
+                    col1, col2 = st.columns([3, 1])
+                    
+                    with col1:
+                        st.markdown(f"""
+                        <div class='donation-card'>
+                            <h4>🍱 {don[1]} ({don[2]})</h4>
+                            <p><strong>Type:</strong> {don[3]} | <strong>Location:</strong> {don[4]}</p>
+                            <p><strong>Expires:</strong> {don[5]} | <strong>Distance:</strong> ~{distance:.1f} km</p>
+                            <p><strong>Details:</strong> {don[8] or 'No additional details'}</p>
+                            <p><strong>Contact:</strong> {don[9]} | 📧 {don[11]} | 📱 {don[10] or 'N/A'}</p>
+                        </div>
+                        """, unsafe_allow_html=True)
+                    
+                    with col2:
+                        image_bytes = get_blob_store().get(don[12])
+                        if image_bytes:
+                            st.image(image_bytes, width=150)
+                    
+                    # This NGO's request status comes from the LEFT JOIN above
+                    existing_status = don[14]
+                    
+                    if existing_status:
+                        st.info(f"📋 Status: {existing_status.upper()}")
+                    else:
+                        if st.button(f"🚀 Request Pickup", key=f"req_{don[0]}", use_container_width=True):
+                            request_pickup(conn, don[0], ngo_id, org_name)
+                            st.success("✅ Request sent to donor!")
+                            st.balloons()
+                            st.rerun()
+                    
+                    st.markdown("---")
         else:
             st.info("📭 No donations available matching your criteria.")
+        
+        show_page_controls("browse", page_rows, page_size, lambda don: (don[15], don[13], don[0]))
     
     with tab2:
         st.subheader("Your Pickup Requests")
         
-        status_filter_req = st.selectbox("Filter Status", ["All", "pending", "accepted", "completed"])
+        # Round trip from the NGO through every accepted pickup, ordered to beat expiry times
+        c.execute('''SELECT d.food_name, d.location, d.latitude, d.longitude, d.expiry_time
+                     FROM requests r
+                     JOIN donations d ON r.donation_id = d.donation_id
+                     WHERE r.ngo_id = ? AND r.status = 'accepted' ''', (ngo_id,))
+        pickups = c.fetchall()
+        
+        if pickups:
+            base = (ngo_lat, ngo_lon)
+            now = datetime.now()
+            deadlines = [(datetime.fromisoformat(str(p[4])) - now).total_seconds() / 3600 for p in pickups]
+            order, total_km, arrivals = plan_route(base, [(p[2], p[3]) for p in pickups], deadlines)
+            
+            with st.expander(f"🗺️ Pickup Route · {len(pickups)} stops · ~{total_km:.1f} km round trip", expanded=True):
+                route = pd.DataFrame([
+                    (stop + 1, pickups[i][0], pickups[i][1],
+                     (now + timedelta(hours=eta)).strftime('%H:%M'), pickups[i][4],
+                     "✅" if eta <= deadlines[i] else "⚠️ Late")
+                    for stop, (i, eta) in enumerate(zip(order, arrivals))
+                ], columns=['Stop', 'Food', 'Location', 'ETA', 'Expires', 'On Time'])
+                st.dataframe(route, use_container_width=True, hide_index=True)
+                
+                # Google Maps accepts at most 9 waypoints in a directions link
+                waypoints = "|".join(f"{pickups[i][2]},{pickups[i][3]}" for i in order[:9])
+                st.link_button("🧭 Open Route in Google Maps",
+                               f"https://www.google.com/maps/dir/?api=1&origin={base[0]},{base[1]}"
+                               f"&destination={base[0]},{base[1]}&waypoints={waypoints}")
+                if len(order) > 9:
+                    st.caption("The map link covers the first 9 stops; follow the table for the rest.")
+        
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            status_filter_req = st.selectbox("Filter Status", ["All", "pending", "accepted", "completed", "expired"])
+        with col2:
+            page_size = st.selectbox("Per Page", PAGE_SIZES, key="my_requests_page_size")
         
-        if status_filter_req == "All":
-            c.execute('''SELECT r.request_id, r.status, d.food_name, d.quantity, d.location, 
-                                d.latitude, d.longitude, u.full_name, u.phone, u.email, r.requested_at, d.donation_id, d.image_data
-                         FROM requests r
-                         JOIN donations d ON r.donation_id = d.donation_id
-                         JOIN users u ON d.donor_id = u.user_id
-                         WHERE r.ngo_id = ?
-                         ORDER BY r.requested_at DESC''', (ngo_id,))
-        else:
-            c.execute('''SELECT r.request_id, r.status, d.food_name, d.quantity, d.location, 
-                                d.latitude, d.longitude, u.full_name, u.phone, u.email, r.requested_at, d.donation_id, d.image_data
-                         FROM requests r
-                         JOIN donations d ON r.donation_id = d.donation_id
-                         JOIN users u ON d.donor_id = u.user_id
-                         WHERE r.ngo_id = ? AND r.status = ?
-                         ORDER BY r.requested_at DESC''', (ngo_id, status_filter_req))
+        cursor = get_page_cursor("my_requests", (status_filter_req, page_size))
+        
+        query = '''SELECT r.request_id, r.status, d.food_name, d.quantity, d.location, 
+                          d.latitude, d.longitude, u.full_name, u.phone, u.email, r.requested_at, d.donation_id, d.image_hash
+                   FROM requests r
+                   JOIN donations d ON r.donation_id = d.donation_id
+                   JOIN users u ON d.donor_id = u.user_id
+                   WHERE r.ngo_id = ?'''
+        params = [ngo_id]
         
-        requests = c.fetchall()
+        if status_filter_req != "All":
+            query += " AND r.status = ?"
+            params.append(status_filter_req)
+        
+        if cursor:
+            query += " AND (r.requested_at, r.request_id) < (?, ?)"
+            params.extend(cursor)
+        
+        query += " ORDER BY r.requested_at DESC, r.request_id DESC LIMIT ?"
+        params.append(page_size + 1)
+        
+        c.execute(query, params)
+        page_rows = c.fetchall()
+        requests = page_rows[:page_size]
         
         if requests:
             for req in requests:
-                status_emoji = {"pending": "⏳", "accepted": "✅", "completed": "🎉"}
+                status_emoji = {"pending": "⏳", "accepted": "✅", "completed": "🎉", "expired": "⌛"}
                 with st.expander(f"{status_emoji.get(req[1], '📋')} {req[2]} - {req[1].upper()}"):
                     col1, col2 = st.columns([2, 1])
                     
@@ -1189,7 +1365,16 @@ def show_ngo_dashboard(conn, user_id):
                                              (req[11],))
                                     c.execute("UPDATE ngo_profiles SET total_pickups = total_pickups + 1 WHERE ngo_id = ?",
                                              (ngo_id,))
+                                    c.execute('''UPDATE users SET completed_donations = completed_donations + 1
+                                                 WHERE user_id = (SELECT donor_id FROM donations WHERE donation_id = ?)''',
+                                             (req[11],))
+                                    # One outbox row per party, so a failure for one is retried on its own
+                                    enqueue_many(conn, [
+                                        ('send_donor_completion_notification', {'donor_email': req[9], 'donation_name': req[2]}),
+                                        ('send_ngo_completion_notification', {'ngo_email': user['email'], 'donation_name': req[2]}),
+                                    ])
                                     conn.commit()
+                                    get_session_store().invalidate_user(user_id)
                                     st.success("✅ Marked as collected!")
                                     st.balloons()
                                     st.rerun()
@@ -1199,20 +1384,22 @@ def show_ngo_dashboard(conn, user_id):
                                 st.link_button("🗺️ Get Directions", map_url)
                     
                     with col2:
-                        if req[12]:
-                            st.image(f"data:image/png;base64,{req[12]}", width=200)
+                        image_bytes = get_blob_store().get(req[12])
+                        if image_bytes:
+                            st.image(image_bytes, width=200)
         else:
             st.info("📭 No pickup requests found.")
+        
+        show_page_controls("my_requests", page_rows, page_size, lambda req: (req[10], req[0]))
     
     with tab3:
         st.subheader("Your Impact Summary")
         
-        c.execute('''SELECT COUNT(*), 
+        total_req, completed, pending, accepted = cached_query(conn, '''SELECT COUNT(*), 
                             SUM(CASE WHEN status='completed' THEN 1 ELSE 0 END),
                             SUM(CASE WHEN status='pending' THEN 1 ELSE 0 END),
                             SUM(CASE WHEN status='accepted' THEN 1 ELSE 0 END)
-                     FROM requests WHERE ngo_id = ?''', (ngo_id,))
-        total_req, completed, pending, accepted = c.fetchone()
+                     FROM requests WHERE ngo_id = ?''', (ngo_id,), tables=("requests",))[0]
         
         col1, col2, col3, col4 = st.columns(4)
         
@@ -1271,32 +1458,48 @@ def show_ngo_dashboard(conn, user_id):
         st.markdown("---")
         st.subheader("📈 Your Pickup Activity")
         
-        c.execute('''SELECT DATE(requested_at) as date, COUNT(*) as count
-                     FROM requests WHERE ngo_id = ?
-                     GROUP BY DATE(requested_at)
-                     ORDER BY date DESC LIMIT 30''', (ngo_id,))
-        activity_data = c.fetchall()
+        activity_data = cached_query(conn, '''SELECT day, requests, completions
+                     FROM ngo_daily WHERE ngo_id = ? AND day != 'unknown' AND (requests > 0 OR completions > 0)
+                     ORDER BY day DESC LIMIT 30''', (ngo_id,), tables=("requests",))
         
         if activity_data:
-            df = pd.DataFrame(activity_data, columns=['Date', 'Requests'])
-            fig = px.bar(df, x='Date', y='Requests', title='Request Activity Over Time')
+            df = pd.DataFrame(activity_data, columns=['Date', 'Requests', 'Completed'])
+            fig = px.bar(df, x='Date', y=['Requests', 'Completed'], barmode='group', title='Request Activity Over Time')
             st.plotly_chart(fig, use_container_width=True)
     
     with tab4:
         st.subheader("🗺️ Nearby Donations Map")
-        st.info("📍 This feature shows nearby food donations on an interactive map")
-        
-        c.execute('''SELECT d.donation_id, d.food_name, d.quantity, d.latitude, d.longitude, d.location
-                     FROM donations d
-                     WHERE d.status = 'pending'
-                     ORDER BY d.created_at DESC LIMIT 20''')
-        map_donations = c.fetchall()
-        
-        if map_donations:
-            map_data = pd.DataFrame(map_donations, columns=['ID', 'Food', 'Quantity', 'lat', 'lon', 'Location'])
-            st.map(map_data[['lat', 'lon']])
-            
-            st.dataframe(map_data[['Food', 'Quantity', 'Location']], use_container_width=True, hide_index=True)
+        map_radius = st.slider("Map Radius (km)", 1, 100, 25, key="map_radius")
+        
+        # Every pending donation in range, not just the latest few: R*Tree box, then vectorised distances
+        min_lat, max_lat, min_lon, max_lon = bounding_box(ngo_lat, ngo_lon, map_radius)
+        c.execute('''SELECT d.donation_id, d.latitude, d.longitude
+                     FROM donation_geo g
+                     JOIN donations d ON d.donation_id = g.donation_id
+                     WHERE g.min_lat >= ? AND g.max_lat <= ? AND g.min_lon >= ? AND g.max_lon <= ?
+                       AND d.status = 'pending' ''', (min_lat, max_lat, min_lon, max_lon))
+        points = np.array(c.fetchall(), dtype=float).reshape(-1, 3)
+        distances, in_range = points_within_km(ngo_lat, ngo_lon, points[:, 1], points[:, 2], map_radius)
+        points, distances = points[in_range], distances[in_range]
+        
+        if len(points):
+            # The browser only gets one dot per grid cell, sized by how many donations it holds
+            zoom = zoom_for_radius(ngo_lat, map_radius)
+            cluster_lats, cluster_lons, counts, cell_km = grid_clusters(points[:, 1], points[:, 2], zoom)
+            clusters = pd.DataFrame({'lat': cluster_lats, 'lon': cluster_lons, 'count': counts,
+                                     'size': cell_km * 500 * np.sqrt(counts / counts.max())})
+            
+            st.info(f"📍 {len(points)} pending donations within {map_radius} km, in {len(clusters)} map clusters")
+            st.map(clusters, size='size', zoom=zoom)
+            
+            nearest = np.argsort(distances, kind='stable')[:100]
+            placeholders = ",".join("?" * nearest.size)
+            c.execute(f'''SELECT donation_id, food_name, quantity, location FROM donations
+                          WHERE donation_id IN ({placeholders})''', points[nearest, 0].astype(int).tolist())
+            details = {row[0]: row[1:] for row in c.fetchall()}
+            nearest_data = pd.DataFrame([details[int(points[i, 0])] + (round(float(distances[i]), 1),) for i in nearest],
+                                        columns=['Food', 'Quantity', 'Location', 'Distance (km)'])
+            st.dataframe(nearest_data, use_container_width=True, hide_index=True)
         else:
             st.info("No active donations to display on map")
 
@@ -1311,17 +1514,11 @@ def show_admin_panel(conn):
         
         c = conn.cursor()
         
-        c.execute("SELECT COUNT(*) FROM users WHERE role='donor'")
-        total_donors = c.fetchone()[0]
-        
-        c.execute("SELECT COUNT(*) FROM users WHERE role='ngo'")
-        total_ngos = c.fetchone()[0]
-        
-        c.execute("SELECT COUNT(*) FROM donations")
-        total_donations = c.fetchone()[0]
-        
-        c.execute("SELECT COUNT(*) FROM donations WHERE status='completed'")
-        completed_donations = c.fetchone()[0]
+        stats = get_platform_stats(conn)
+        total_donors = stats['users_donor']
+        total_ngos = stats['users_ngo']
+        total_donations = stats['donations_total']
+        completed_donations = stats['donations_completed']
         
         col1, col2, col3, col4 = st.columns(4)
         
@@ -1357,6 +1554,39 @@ def show_admin_panel(conn):
             </div>
             """, unsafe_allow_html=True)
         
+        # Counters, daily rollups and streaks are maintained on write; this recomputes them if they ever drift
+        if st.button("🔄 Recompute Counters", key="rebuild_stats"):
+            rebuild_platform_stats(conn)
+            rebuild_daily_rollups(conn)
+            backfill_streaks(conn)
+            # Badges come from the streaks just rewritten; drop every cached identity
+            get_session_store().invalidate_all()
+            st.success("✅ Counters, daily rollups and streaks recomputed from base tables")
+            st.rerun()
+        
+        # Emails are delivered by the outbox worker; dead letters exhausted their retries
+        st.markdown("---")
+        st.markdown("### 📬 Notification Outbox")
+        outbox = outbox_counts(conn)
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Pending", outbox.get('pending', 0))
+        with col2:
+            st.metric("Sending", outbox.get('sending', 0))
+        with col3:
+            st.metric("Sent", outbox.get('sent', 0))
+        with col4:
+            st.metric("Dead Letters", outbox.get('dead', 0))
+        
+        if not email_service_from_env().enabled:
+            st.caption("SMTP is not configured, so notifications stay queued until SMTP_EMAIL and SMTP_PASSWORD are set")
+        
+        if outbox.get('dead') and st.button("♻️ Retry Dead Letters", key="retry_outbox"):
+            requeued = retry_dead_letters(conn)
+            st.success(f"✅ Re-queued {requeued} notifications")
+            st.rerun()
+        
         st.markdown("---")
         st.subheader("📋 Recent Donations")
         
@@ -1373,7 +1603,7 @@ def show_admin_panel(conn):
     with tab2:
         st.subheader("NGO Verification Requests")
         
-        c.execute('''SELECT n.ngo_id, n.organization_name, n.registration_number, n.address, u.email, u.phone, u.full_name
+        c.execute('''SELECT n.ngo_id, n.organization_name, n.registration_number, n.address, u.email, u.phone, u.full_name, n.user_id
                      FROM ngo_profiles n
                      JOIN users u ON n.user_id = u.user_id
                      WHERE n.verified = 0''')
@@ -1392,7 +1622,10 @@ def show_admin_panel(conn):
                     with col1:
                         if st.button("✅ Verify & Approve", key=f"verify_{ngo[0]}", use_container_width=True):
                             c.execute("UPDATE ngo_profiles SET verified=1 WHERE ngo_id=?", (ngo[0],))
+                            enqueue(conn, 'send_ngo_verification_notification', ngo_email=ngo[4],
+                                    organization_name=ngo[1], approved=True)
                             conn.commit()
+                            get_session_store().invalidate_user(ngo[7])
                             st.success("✅ NGO verified!")
                             st.balloons()
                             st.rerun()
@@ -1400,6 +1633,7 @@ def show_admin_panel(conn):
                         if st.button("❌ Reject", key=f"reject_{ngo[0]}", use_container_width=True):
                             c.execute("DELETE FROM ngo_profiles WHERE ngo_id=?", (ngo[0],))
                             conn.commit()
+                            get_session_store().invalidate_user(ngo[7])
                             st.warning("NGO rejected")
                             st.rerun()
         else:
@@ -1408,34 +1642,55 @@ def show_admin_panel(conn):
     with tab3:
         st.subheader("User Management")
         
-        filter_role = st.selectbox("Filter by Role", ["All", "donor", "ngo", "admin"])
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            filter_role = st.selectbox("Filter by Role", ["All", "donor", "ngo", "admin"])
+        with col2:
+            page_size = st.selectbox("Per Page", PAGE_SIZES, index=2, key="users_page_size")
+        
+        cursor = get_page_cursor("admin_users", (filter_role, page_size))
         
-        if filter_role == "All":
-            c.execute('''SELECT user_id, email, full_name, role, status, created_at
-                         FROM users ORDER BY created_at DESC''')
-        else:
-            c.execute('''SELECT user_id, email, full_name, role, status, created_at
-                         FROM users WHERE role=? ORDER BY created_at DESC''', (filter_role,))
+        base_query = '''SELECT user_id, email, full_name, role, status, created_at
+                        FROM users'''
+        base_params = []
+        if filter_role != "All":
+            base_query += " WHERE role = ?"
+            base_params.append(filter_role)
+        
+        query, params = base_query, list(base_params)
+        if cursor:
+            query += " AND" if base_params else " WHERE"
+            query += " (created_at, user_id) < (?, ?)"
+            params.extend(cursor)
         
-        users = c.fetchall()
+        query += " ORDER BY created_at DESC, user_id DESC LIMIT ?"
+        params.append(page_size + 1)
+        
+        c.execute(query, params)
+        page_rows = c.fetchall()
+        users = page_rows[:page_size]
         
         if users:
             df = pd.DataFrame(users, columns=['ID', 'Email', 'Name', 'Role', 'Status', 'Joined'])
             st.dataframe(df, use_container_width=True, hide_index=True)
             
-            # Export option
-            csv = df.to_csv(index=False)
-            st.download_button("📥 Export Users CSV", csv, "users.csv", "text/csv")
+            show_page_controls("admin_users", page_rows, page_size, lambda user: (user[5], user[0]))
+            
+            # Export option; the full listing is only read when an export is requested
+            if st.button("📦 Prepare Users CSV", key="prepare_users_csv"):
+                c.execute(base_query + " ORDER BY created_at DESC, user_id DESC", base_params)
+                export_df = pd.DataFrame(c.fetchall(), columns=['ID', 'Email', 'Name', 'Role', 'Status', 'Joined'])
+                st.download_button("📥 Export Users CSV", export_df.to_csv(index=False), "users.csv", "text/csv")
     
     with tab4:
         st.subheader("System Analytics")
         
-        # Donations over time
-        c.execute('''SELECT DATE(created_at) as date, COUNT(*) as count
-                     FROM donations
-                     GROUP BY DATE(created_at)
-                     ORDER BY date DESC LIMIT 30''')
-        data = c.fetchall()
+        # Donations over time, from the daily rollup instead of a DATE() scan of every donation
+        data = cached_query(conn, '''SELECT day, SUM(donations) as count
+                     FROM donation_daily
+                     WHERE day != 'unknown'
+                     GROUP BY day HAVING count > 0
+                     ORDER BY day DESC LIMIT 30''', tables=("donations",))
         
         if data:
             df = pd.DataFrame(data, columns=['Date', 'Donations'])
@@ -1447,10 +1702,9 @@ def show_admin_panel(conn):
         
         with col1:
             # Status distribution
-            c.execute('''SELECT status, COUNT(*) as count
-                         FROM donations
-                         GROUP BY status''')
-            status_data = c.fetchall()
+            status_data = cached_query(conn, '''SELECT status, SUM(donations) as count
+                         FROM donation_daily
+                         GROUP BY status HAVING count > 0''', tables=("donations",))
             
             if status_data:
                 df_status = pd.DataFrame(status_data, columns=['Status', 'Count'])
@@ -1459,61 +1713,75 @@ def show_admin_panel(conn):
         
         with col2:
             # Food type distribution
-            c.execute('''SELECT food_type, COUNT(*) as count
-                         FROM donations
-                         GROUP BY food_type
-                         ORDER BY count DESC''')
-            food_data = c.fetchall()
+            food_data = cached_query(conn, '''SELECT food_type, SUM(donations) as count
+                         FROM donation_daily
+                         GROUP BY food_type HAVING count > 0
+                         ORDER BY count DESC''', tables=("donations",))
             
             if food_data:
                 df_food = pd.DataFrame(food_data, columns=['Type', 'Count'])
                 fig3 = px.bar(df_food, x='Type', y='Count', title='Donations by Food Type')
                 st.plotly_chart(fig3, use_container_width=True)
+        
+        # Query cache effectiveness across all sessions
+        st.markdown("---")
+        st.markdown("### ⚡ Query Cache")
+        cache_stats = get_query_cache().stats()
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Hits", f"{cache_stats['hits']:,}")
+        with col2:
+            st.metric("Misses", f"{cache_stats['misses']:,}")
+        with col3:
+            st.metric("Hit Rate", f"{cache_stats['hit_rate']:.0%}")
+        with col4:
+            st.metric("Cached Queries", cache_stats['entries'])
     
     with tab5:
         st.subheader("🏆 Leaderboards")
         
+        # Rankings are snapshotted in batch by the leaderboard worker; this only reads the stored rows
+        periods = {"This Week": "weekly", "This Month": "monthly", "All Time": "all_time"}
+        period = periods[st.radio("Period", list(periods), index=2, horizontal=True, key="leaderboard_period")]
+        top_donors, computed_at = read_leaderboard(conn, "donors", period)
+        top_ngos, _ = read_leaderboard(conn, "ngos", period)
+        
         col1, col2 = st.columns(2)
         
         with col1:
             st.markdown("### 👑 Top Donors")
-            c.execute('''SELECT u.full_name, COUNT(*) as donations
-                         FROM donations d
-                         JOIN users u ON d.donor_id = u.user_id
-                         WHERE d.status = 'completed'
-                         GROUP BY d.donor_id
-                         ORDER BY donations DESC
-                         LIMIT 10''')
-            top_donors = c.fetchall()
             
             if top_donors:
-                for idx, donor in enumerate(top_donors, 1):
+                for idx, name, score in top_donors:
                     medal = "🥇" if idx == 1 else "🥈" if idx == 2 else "🥉" if idx == 3 else f"{idx}."
                     st.markdown(f"""
                     <div class='leaderboard-item'>
-                        <span><strong>{medal} {donor[0]}</strong></span>
-                        <span><strong>{donor[1]}</strong> donations</span>
+                        <span><strong>{medal} {name}</strong></span>
+                        <span><strong>{score}</strong> donations</span>
                     </div>
                     """, unsafe_allow_html=True)
         
         with col2:
             st.markdown("### 🌟 Top NGOs")
-            c.execute('''SELECT n.organization_name, n.total_pickups
-                         FROM ngo_profiles n
-                         WHERE n.verified = 1
-                         ORDER BY n.total_pickups DESC
-                         LIMIT 10''')
-            top_ngos = c.fetchall()
             
             if top_ngos:
-                for idx, ngo in enumerate(top_ngos, 1):
+                for idx, name, score in top_ngos:
                     medal = "🥇" if idx == 1 else "🥈" if idx == 2 else "🥉" if idx == 3 else f"{idx}."
                     st.markdown(f"""
                     <div class='leaderboard-item'>
-                        <span><strong>{medal} {ngo[0]}</strong></span>
-                        <span><strong>{ngo[1]}</strong> pickups</span>
+                        <span><strong>{medal} {name}</strong></span>
+                        <span><strong>{score}</strong> pickups</span>
                     </div>
                     """, unsafe_allow_html=True)
+        
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            st.caption(f"Snapshot taken {computed_at}" if computed_at else "No snapshot for this period yet")
+        with col2:
+            if st.button("🔄 Refresh Now", key="refresh_leaderboards", use_container_width=True):
+                snapshot_leaderboards(conn)
+                st.rerun()
 
 # Login/Register Page
 def show_auth_page(conn):
@@ -1533,8 +1801,7 @@ def show_auth_page(conn):
                 if email and password:
                     success, user_data = login_user(conn, email, password)
                     if success:
-                        st.session_state.logged_in = True
-                        st.session_state.user = user_data
+                        st.session_state.session_token = get_session_store().create(conn, user_data['user_id'])
                         st.success(f"✅ Welcome back, {user_data['name']}!")
                         st.balloons()
                         st.session_state.page = "dashboard"
@@ -1581,15 +1848,13 @@ def show_auth_page(conn):
                         st.error(f"❌ {result}")
 
 # Main Application
-def main():
-    conn = init_database()
-    
-    if 'logged_in' not in st.session_state:
-        st.session_state.logged_in = False
+def render_app(conn):
     if 'page' not in st.session_state:
         st.session_state.page = 'home'
-    if 'user' not in st.session_state:
-        st.session_state.user = None
+    
+    # Identity comes from the server-side session; an expired or revoked token logs the user out
+    st.session_state.user = get_session_store().get(conn, st.session_state.get('session_token'))
+    st.session_state.logged_in = st.session_state.user is not None
     
     # Sidebar
     with st.sidebar:
@@ -1641,6 +1906,8 @@ def main():
             st.markdown("---")
             
             if st.button("🚪 Logout", key="nav_logout", use_container_width=True):
+                get_session_store().revoke(st.session_state.session_token)
+                st.session_state.session_token = None
                 st.session_state.logged_in = False
                 st.session_state.user = None
                 st.session_state.page = 'home'
@@ -1652,12 +1919,9 @@ def main():
         
         # Quick Stats in Sidebar
         st.markdown("### 📊 Live Stats")
-        c = conn.cursor()
-        c.execute("SELECT COUNT(*) FROM donations WHERE status='completed'")
-        completed = c.fetchone()[0]
-        
-        c.execute("SELECT COUNT(*) FROM donations WHERE status='pending'")
-        pending = c.fetchone()[0]
+        stats = get_platform_stats(conn)
+        completed = stats['donations_completed']
+        pending = stats['donations_pending']
         
         st.markdown(f"""
         <div class='metric-container' style='margin: 10px 0;'>
@@ -1693,13 +1957,13 @@ def main():
     elif st.session_state.page == 'auth' or st.session_state.page == 'register':
         show_auth_page(conn)
     elif st.session_state.page == 'dashboard' and st.session_state.logged_in:
-        user_role = st.session_state.user['role']
-        user_id = st.session_state.user['user_id']
+        user = st.session_state.user
+        user_role = user['role']
         
         if user_role == 'donor':
-            show_donor_dashboard(conn, user_id)
+            show_donor_dashboard(conn, user)
         elif user_role == 'ngo':
-            show_ngo_dashboard(conn, user_id)
+            show_ngo_dashboard(conn, user)
         elif user_role == 'admin':
             show_admin_panel(conn)
     else:
@@ -1714,5 +1978,12 @@ def main():
     </div>
     """, unsafe_allow_html=True)
 
+def main():
+    for env_var in BACKGROUND_WORKERS:
+        start_worker(env_var)
+    # Each script run checks out its own connection instead of sharing one across sessions
+    with init_database().connection() as conn:
+        render_app(conn)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
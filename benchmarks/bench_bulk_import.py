@@ -0,0 +1,85 @@
+"""
+Bulk Import Benchmark
+Time to add N donations through the one-at-a-time "Post Donation" path
+(insert, NGO alerts, stats update and commit per row) versus a single
+bulk_import.import_donations call, which queues the same alerts; both run
+against the same set of nearby verified NGOs
+
+Usage: python benchmarks/bench_bulk_import.py [--rows 10000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bulk_import import import_donations
+from database import ConnectionPool
+from migrations import migrate
+from notifications import queue_donation_alerts
+from qr_codes import new_payload
+from streaks import record_donation
+
+
+def make_records(count):
+    expiry = (datetime.now() + timedelta(hours=6)).strftime("%Y-%m-%d %H:%M")
+    return [{'food_name': f"Meal box {i}", 'quantity': '20 servings', 'food_type': 'Cooked Food',
+             'expiry_time': expiry, 'location': f"Outlet {i % 40}",
+             'latitude': 28.5 + (i % 100) * 0.002, 'longitude': 77.1 + (i % 97) * 0.002,
+             'description': 'End of day surplus'} for i in range(count)]
+
+
+def seed_ngos(conn, count=50):
+    for i in range(count):
+        c = conn.execute('''INSERT INTO users (email, password_hash, full_name, role)
+                             VALUES (?, 'x', ?, 'ngo')''', (f"ngo{i}@example.com", f"NGO {i}"))
+        conn.execute('''INSERT INTO ngo_profiles (user_id, organization_name, address, latitude, longitude, verified)
+                         VALUES (?, ?, 'Delhi', ?, ?, 1)''',
+                     (c.lastrowid, f"NGO {i}", 28.5 + (i % 10) * 0.02, 77.1 + (i // 10) * 0.02))
+
+
+def post_one_by_one(conn, donor_id, records):
+    c = conn.cursor()
+    for record in records:
+        c.execute('''INSERT INTO donations
+                     (donor_id, food_name, quantity, food_type, expiry_time, location, latitude, longitude, description, qr_payload)
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                  (donor_id, record['food_name'], record['quantity'], record['food_type'],
+                   datetime.fromisoformat(record['expiry_time']), record['location'],
+                   record['latitude'], record['longitude'], record['description'], new_payload(donor_id)))
+        queue_donation_alerts(conn, c.lastrowid)
+        record_donation(conn, donor_id, datetime.now().date())
+        conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    args = parser.parse_args()
+
+    records = make_records(args.rows)
+    for label, run in (("one by one", lambda conn: post_one_by_one(conn, 1, records)),
+                       ("bulk import", lambda conn: import_donations(conn, 1, records))):
+        pool = ConnectionPool(os.path.join(tempfile.mkdtemp(), 'bench.db'))
+        with pool.connection() as conn:
+            migrate(conn)
+            conn.execute('''INSERT INTO users (email, password_hash, full_name, role)
+                            VALUES ('chain@example.com', 'x', 'Restaurant Chain', 'donor')''')
+            seed_ngos(conn)
+            conn.commit()
+
+            start = time.perf_counter()
+            run(conn)
+            elapsed = time.perf_counter() - start
+            stored = conn.execute("SELECT COUNT(*) FROM donations").fetchone()[0]
+            alerts = conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+        print(f"{label:<12} {args.rows} rows  {elapsed:7.2f} s  {args.rows / elapsed:9.0f} rows/s  "
+              f"({stored} stored, {alerts} alerts queued)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Distance Filter Benchmark
+Time to find every point within a radius of one NGO using a Python loop,
+the per-row haversine_km SQL function, and the vectorised NumPy path
+
+Usage: python benchmarks/bench_distance.py [--points 1000 10000 100000] [--radius 25]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geo import haversine_km, points_within_km, register_sql_functions
+
+BASE = (28.6139, 77.2090)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--points', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--radius', type=float, default=25)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(3)
+    conn = sqlite3.connect(":memory:")
+    register_sql_functions(conn)
+
+    for count in args.points:
+        # Roughly 65 x 65 km around the NGO
+        lats = BASE[0] + (rng.random(count) - 0.5) * 0.6
+        lons = BASE[1] + (rng.random(count) - 0.5) * 0.6
+        conn.execute("DROP TABLE IF EXISTS points")
+        conn.execute("CREATE TABLE points (id INTEGER PRIMARY KEY, latitude REAL, longitude REAL)")
+        conn.executemany("INSERT INTO points (latitude, longitude) VALUES (?, ?)", zip(lats.tolist(), lons.tolist()))
+
+        start = time.perf_counter()
+        loop_hits = sum(haversine_km(*BASE, lat, lon) <= args.radius for lat, lon in zip(lats.tolist(), lons.tolist()))
+        looped = time.perf_counter()
+        sql_hits = conn.execute("SELECT COUNT(*) FROM points WHERE haversine_km(?, ?, latitude, longitude) <= ?",
+                                (*BASE, args.radius)).fetchone()[0]
+        queried = time.perf_counter()
+        _, mask = points_within_km(*BASE, lats, lons, args.radius)
+        numpy_hits = int(mask.sum())
+        vectorised = time.perf_counter()
+
+        assert loop_hits == sql_hits == numpy_hits
+        print(f"{count:>7} points  python loop {(looped - start) * 1000:8.2f} ms  "
+              f"sql function {(queried - looped) * 1000:8.2f} ms  "
+              f"numpy {(vectorised - queried) * 1000:8.2f} ms  {numpy_hits} within {args.radius:g} km")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Matching Engine Benchmark
+Time to build the cost matrix and solve the capacity-constrained assignment
+for synthetic donations and NGOs scattered over a city-sized area
+
+Usage: python benchmarks/bench_matching.py [--donations 5000] [--ngos 500]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from matching import assign, cost_matrix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--donations', type=int, default=5000)
+    parser.add_argument('--ngos', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    # Roughly 65 x 65 km around Delhi NCR
+    donation_lats, donation_lons = 28.3 + rng.random(args.donations) * 0.6, 76.9 + rng.random(args.donations) * 0.6
+    ngo_lats, ngo_lons = 28.3 + rng.random(args.ngos) * 0.6, 76.9 + rng.random(args.ngos) * 0.6
+    hours_left = rng.uniform(0.5, 48, args.donations)
+    slots = rng.integers(0, 5, args.ngos)
+
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        cost, _ = cost_matrix(donation_lats, donation_lons, hours_left, ngo_lats, ngo_lons)
+        built = time.perf_counter()
+        assigned = assign(cost, slots)
+        solved = time.perf_counter()
+
+        print(f"{args.donations} donations x {args.ngos} NGOs  "
+              f"cost matrix {(built - start) * 1000:7.1f} ms  assign {(solved - built) * 1000:7.1f} ms  "
+              f"total {(solved - start) * 1000:7.1f} ms  matched {int((assigned >= 0).sum())} / {int(slots.sum())} slots")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Post Donation Latency Benchmark
+Time spent on the "Post Donation" submit path with the QR code rendered and
+stored eagerly versus storing only its payload, plus the cost of the first
+and subsequent views once rendering moved to the donor's My Donations tab
+
+Usage: python benchmarks/bench_post_donation.py [--posts 200]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blob_store import BlobStore
+from database import ConnectionPool
+from migrations import migrate
+from qr_codes import QRCodeCache, new_payload, render_png
+
+INSERT_DONATION = '''INSERT INTO donations
+                     (donor_id, food_name, quantity, food_type, expiry_time, location, latitude, longitude, description, {qr_column})
+                     VALUES (1, 'Vegetable Biryani', '40 servings', 'Cooked Food', '2030-01-01 21:00',
+                             'Community Hall', 28.61, 77.21, 'Packed in foil trays', ?)'''
+
+
+def post_eager(conn, store):
+    qr_hash = store.put(render_png(new_payload(1)))
+    conn.execute(INSERT_DONATION.format(qr_column='qr_hash'), (qr_hash,))
+    conn.commit()
+
+
+def post_lazy(conn, store):
+    conn.execute(INSERT_DONATION.format(qr_column='qr_payload'), (new_payload(1),))
+    conn.commit()
+
+
+def timed(fn, count):
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<36} median {statistics.median(samples):8.3f} ms   p95 {p95:8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--posts', type=int, default=200)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    pool = ConnectionPool(os.path.join(workdir, 'bench.db'))
+    store = BlobStore(os.path.join(workdir, 'media'))
+
+    with pool.connection() as conn:
+        migrate(conn)
+        report("post: render + store QR PNG", timed(lambda: post_eager(conn, store), args.posts))
+        report("post: store QR payload only", timed(lambda: post_lazy(conn, store), args.posts))
+
+    cache = QRCodeCache(max_entries=args.posts)
+    payloads = [new_payload(i) + f"-{i}" for i in range(args.posts)]
+    views = iter(enumerate(payloads))
+    report("view: first render", timed(lambda: cache.png(*next(views)), args.posts))
+    views = iter(enumerate(payloads))
+    report("view: cached", timed(lambda: cache.png(*next(views)), args.posts))
+
+
+if __name__ == "__main__":
+    main()
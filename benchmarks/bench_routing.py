@@ -0,0 +1,47 @@
+"""
+Route Planner Benchmark
+Planning time and round-trip length for random pickup sets around one NGO,
+with and without expiry deadlines
+
+Usage: python benchmarks/bench_routing.py [--stops 10 50 100]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from routing import plan_route
+
+BASE = (28.6139, 77.2090)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--stops', type=int, nargs='+', default=[10, 50, 100])
+    parser.add_argument('--span-deg', type=float, default=0.1, help='side of the square the stops fall in')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    for count in args.stops:
+        stops = list(zip(BASE[0] + (rng.random(count) - 0.5) * args.span_deg,
+                         BASE[1] + (rng.random(count) - 0.5) * args.span_deg))
+        deadlines = rng.uniform(1, 24, count)
+
+        for label, kwargs in (("no deadlines", {}), ("with deadlines", {'deadlines_hours': deadlines})):
+            start = time.perf_counter()
+            order, total_km, arrivals = plan_route(BASE, stops, **kwargs)
+            elapsed = time.perf_counter() - start
+
+            late = 0
+            if kwargs:
+                late = int(sum(eta > deadlines[i] for i, eta in zip(order, arrivals)))
+            print(f"{count:>4} stops  {label:<15} {elapsed * 1000:8.1f} ms  {total_km:8.1f} km  {late:>3} late")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+SMTP Session Pool Benchmark
+Compares per-message SMTP sessions with pooled and pipelined delivery
+against a local stand-in server
+
+Usage: python benchmarks/bench_smtp_pool.py [--messages 500] [--latency-ms 2]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from email_service import EmailService
+from local_smtp import LocalSMTPServer
+
+
+def make_service(server, pool_size):
+    return EmailService(smtp_server='127.0.0.1', smtp_port=server.port,
+                        email='bench@localhost', password='secret',
+                        use_tls=False, pool_size=pool_size)
+
+
+def messages(count):
+    return [(f"ngo{i}@example.org", f"Benchmark message {i}", "Fresh food available near you.")
+            for i in range(count)]
+
+
+def bench(label, server, send):
+    before = dict(server.counts)
+    start = time.perf_counter()
+    sent = send()
+    elapsed = time.perf_counter() - start
+
+    connections = server.counts['connections'] - before['connections']
+    print(f"{label:<32} {sent:>6} sent  {elapsed:7.3f}s  {sent / elapsed:9.1f} msg/s  {connections:>5} connections")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--latency-ms', type=float, default=2.0,
+                        help='delay before every server reply, to mimic a network round trip')
+    args = parser.parse_args()
+
+    server = LocalSMTPServer(latency=args.latency_ms / 1000).start()
+    batch = messages(args.messages)
+
+    try:
+        unpooled = make_service(server, pool_size=0)
+        bench("new session per message", server,
+              lambda: sum(unpooled.send_email(*msg) for msg in batch))
+
+        with make_service(server, pool_size=2) as pooled:
+            bench("pooled session per message", server,
+                  lambda: sum(pooled.send_email(*msg) for msg in batch))
+
+        with make_service(server, pool_size=2) as pipelined:
+            bench("send_bulk over one session", server,
+                  lambda: pipelined.send_bulk(batch))
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Local SMTP Stand-in
+Minimal threaded SMTP server that accepts and discards mail, for benchmarks
+Accepts any AUTH PLAIN/LOGIN credentials and never offers STARTTLS
+"""
+
+import socketserver
+import threading
+import time
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.server.record('connections')
+        self._reply("220 localhost stand-in SMTP ready")
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.strip().split(b" ", 1)[0].upper()
+
+            if command == b"EHLO":
+                self.wfile.write(b"250-localhost\r\n250-AUTH PLAIN LOGIN\r\n250-8BITMIME\r\n")
+                self._reply("250 SMTPUTF8")
+            elif command == b"AUTH":
+                self.server.record('logins')
+                if line.strip().upper() == b"AUTH LOGIN":
+                    self._reply("334 VXNlcm5hbWU6")
+                    self.rfile.readline()
+                    self._reply("334 UGFzc3dvcmQ6")
+                    self.rfile.readline()
+                self._reply("235 Authentication successful")
+            elif command == b"DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                self.server.record('messages')
+                self._reply("250 Queued")
+            elif command == b"QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                # HELO, MAIL, RCPT, RSET, NOOP
+                self._reply("250 OK")
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0):
+        """
+        Initialize stand-in server; port=0 picks a free port
+        latency adds a delay (seconds) before every reply to mimic a network round trip
+        """
+        super().__init__((host, port), _SMTPHandler)
+        self.latency = latency
+        self.counts = {'connections': 0, 'logins': 0, 'messages': 0}
+        self._lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def record(self, counter):
+        with self._lock:
+            self.counts[counter] += 1
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
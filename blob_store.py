@@ -0,0 +1,107 @@
+"""
+Blob Store
+Content-addressed on-disk storage for donation images and QR codes
+"""
+
+import base64
+import binascii
+import hashlib
+import os
+import tempfile
+
+
+class BlobStore:
+    def __init__(self, root='media'):
+        """
+        Initialize blob store
+        Blobs live at <root>/<first two hex chars>/<sha256 hex digest>
+        """
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, digest):
+        """
+        Filesystem path for a digest
+        """
+        return os.path.join(self.root, digest[:2], digest)
+
+    def put(self, data):
+        """
+        Store raw bytes and return their sha256 hex digest
+        Writing the same content twice is a no-op
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        target = self.path(digest)
+
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target))
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, target)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+        return digest
+
+    def get(self, digest):
+        """
+        Return the bytes for a digest, or None if it is unknown
+        """
+        if not digest:
+            return None
+        try:
+            with open(self.path(digest), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def exists(self, digest):
+        """
+        Check whether a digest is stored
+        """
+        return bool(digest) and os.path.exists(self.path(digest))
+
+
+def migrate_base64_columns(conn, store, batch_size=200):
+    """
+    Move legacy base64 image_data/qr_code values into the blob store
+    and record their digests in image_hash/qr_hash
+    Returns the number of donations migrated
+    """
+    c = conn.cursor()
+    migrated = 0
+
+    while True:
+        c.execute('''SELECT donation_id, image_data, qr_code FROM donations
+                     WHERE image_data IS NOT NULL OR qr_code IS NOT NULL
+                     LIMIT ?''', (batch_size,))
+        rows = c.fetchall()
+        if not rows:
+            break
+
+        updates = []
+        for donation_id, image_data, qr_code in rows:
+            updates.append((_put_base64(store, image_data), _put_base64(store, qr_code), donation_id))
+
+        c.executemany('''UPDATE donations
+                         SET image_hash = COALESCE(?, image_hash), qr_hash = COALESCE(?, qr_hash),
+                             image_data = NULL, qr_code = NULL
+                         WHERE donation_id = ?''', updates)
+        conn.commit()
+        migrated += len(rows)
+
+    return migrated
+
+
+def _put_base64(store, value):
+    if not value:
+        return None
+    try:
+        return store.put(base64.b64decode(value, validate=True))
+    except (binascii.Error, ValueError):
+        print(f"Skipping undecodable blob ({len(value)} chars)")
+        return None
@@ -0,0 +1,134 @@
+"""
+Database Connection Manager
+Pooled per-session SQLite connections with WAL journaling and tuned pragmas,
+and the base class for the background workers that share them
+"""
+
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from geo import register_sql_functions
+
+DATABASE_PATH = 'food_donation.db'
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',      # readers never block the writer and vice versa
+    'synchronous': 'NORMAL',    # durable across app crashes, fsync only at checkpoints
+    'cache_size': -16000,       # 16 MB page cache per connection (negative = KiB)
+    'mmap_size': 268435456,     # 256 MB memory-mapped reads
+    'temp_store': 'MEMORY',
+}
+
+
+class ConnectionPool:
+    def __init__(self, path=DATABASE_PATH, max_idle=8, busy_timeout_ms=5000, pragmas=None):
+        """
+        Initialize connection pool
+        At most max_idle connections are kept open between checkouts
+        """
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.pragmas = dict(DEFAULT_PRAGMAS, **(pragmas or {}))
+        self._idle = queue.LifoQueue(maxsize=max_idle)
+
+    def connect(self):
+        """
+        Open a new configured connection outside the pool
+        """
+        # A pooled connection is handed between threads, but only ever used by one at a time
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        register_sql_functions(conn)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """
+        Check out a connection for the duration of the block
+        Any transaction left open when the block exits is rolled back
+        """
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self.connect()
+
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def close_all(self):
+        """
+        Close every idle connection
+        """
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class PeriodicWorker:
+    name = "worker"
+
+    def __init__(self, pool, interval):
+        """
+        Initialize periodic worker; calls step() every interval seconds
+        """
+        self.pool = pool
+        self.interval = interval
+        self._stop = threading.Event()
+
+    def step(self):
+        """
+        Do one pass of work; return True to run again without waiting
+        """
+        raise NotImplementedError
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            try:
+                busy = self.step()
+            except Exception as e:
+                print(f"{self.name} error: {e}")
+                busy = False
+            if not busy:
+                self._stop.wait(self.interval)
+
+    def start(self):
+        """
+        Run the worker on a daemon thread
+        """
+        threading.Thread(target=self.run_forever, name=self.name, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    @classmethod
+    def run_standalone(cls, *args, **kwargs):
+        """
+        Migrate the default database and run the worker in the foreground
+        until Ctrl+C; used by each worker module's __main__
+        """
+        from migrations import migrate
+
+        pool = ConnectionPool()
+        with pool.connection() as conn:
+            migrate(conn)
+
+        worker = cls(pool, *args, **kwargs)
+        print(f"{cls.name} running; Ctrl+C to stop")
+        try:
+            worker.run_forever()
+        except KeyboardInterrupt:
+            worker.stop()
@@ -3,22 +3,195 @@ Email Notification Service
 Handles email notifications for donations, requests, and alerts
 """
 
+import queue
 import smtplib
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
+from string import Template
+
+class CompiledTemplate:
+    def __init__(self, template):
+        """
+        Split a $-placeholder template once into literal chunks and field names,
+        so substitute() is a single join instead of a regex scan of the text
+        """
+        self.template = template
+        self._literals, self._names = [], []
+        chunk, last = [], 0
+        for match in Template.pattern.finditer(template):
+            chunk.append(template[last:match.start()])
+            last = match.end()
+            name = match.group('named') or match.group('braced')
+            if match.group('escaped') is not None:
+                chunk.append(match.group('escaped'))
+            elif name:
+                self._literals.append(''.join(chunk))
+                self._names.append(name)
+                chunk = []
+            else:
+                raise ValueError(f"Invalid placeholder in template at offset {match.start()}")
+        chunk.append(template[last:])
+        self._literals.append(''.join(chunk))
+    
+    def substitute(self, mapping=None, /, **kws):
+        """
+        Same contract as string.Template.substitute: keyword values win over
+        mapping and a missing field raises KeyError
+        """
+        values = dict(mapping, **kws) if mapping else kws
+        parts = [self._literals[0]]
+        for name, literal in zip(self._names, self._literals[1:]):
+            parts.append(str(values[name]))
+            parts.append(literal)
+        return ''.join(parts)
 
 class EmailService:
-    def __init__(self, smtp_server='smtp.gmail.com', smtp_port=587, email=None, password=None):
+    def __init__(self, smtp_server='smtp.gmail.com', smtp_port=587, email=None, password=None,
+                 use_tls=True, pool_size=2, max_idle_seconds=60):
         """
         Initialize email service
         For Gmail: Enable 2FA and use App Password
+        Up to pool_size authenticated SMTP sessions are kept open and reused;
+        pool_size=0 opens a fresh session for every send
         """
         self.smtp_server = smtp_server
         self.smtp_port = smtp_port
         self.email = email
         self.password = password
+        self.use_tls = use_tls
+        self.max_idle_seconds = max_idle_seconds
         self.enabled = email is not None and password is not None
+        self._pool = queue.LifoQueue(maxsize=pool_size) if pool_size > 0 else None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def close(self):
+        """
+        Log out of every pooled SMTP session
+        """
+        while self._pool is not None:
+            try:
+                server, _ = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            self._quit(server)
+    
+    def _connect(self):
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=30)
+        if self.use_tls:
+            server.starttls()
+        server.login(self.email, self.password)
+        return server
+    
+    def _quit(self, server):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+    
+    def _checkout(self):
+        """
+        Take a live session from the pool, or open a new one
+        Sessions idle longer than max_idle_seconds are probed with NOOP first
+        """
+        while self._pool is not None:
+            try:
+                server, last_used = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            
+            if time.monotonic() - last_used < self.max_idle_seconds:
+                return server
+            try:
+                server.noop()
+                return server
+            except (smtplib.SMTPException, OSError):
+                self._quit(server)
+        
+        return self._connect()
+    
+    def _checkin(self, server):
+        if self._pool is None:
+            self._quit(server)
+            return
+        try:
+            self._pool.put_nowait((server, time.monotonic()))
+        except queue.Full:
+            self._quit(server)
+    
+    def _build_message(self, to_email, subject, body, html=False):
+        msg = MIMEMultipart('alternative')
+        msg['From'] = self.email
+        msg['To'] = to_email
+        msg['Subject'] = subject
+        
+        if html:
+            msg.attach(MIMEText(body, 'html'))
+        else:
+            msg.attach(MIMEText(body, 'plain'))
+        
+        return msg
+    
+    def _shared_messages(self, recipients, subject, body, html=False):
+        """
+        Yield one message per recipient, reusing a single MIME tree and body part
+        Only the To header changes, so each message must be sent before the next
+        is requested -- which is how _deliver consumes them
+        """
+        msg = self._build_message(None, subject, body, html)
+        for to_email in recipients:
+            del msg['To']
+            msg['To'] = to_email
+            yield msg
+    
+    def _deliver(self, messages, failed=None):
+        """
+        Send messages back to back over one pooled session
+        A dropped connection is reopened and the message retried once
+        Returns the number of messages accepted by the server; the To address
+        of each message that was not is appended to failed, if given
+        """
+        sent = 0
+        server = None
+        
+        try:
+            for msg in messages:
+                sent_before = sent
+                for attempt in range(2):
+                    try:
+                        if server is None:
+                            server = self._checkout()
+                        server.send_message(msg)
+                        sent += 1
+                        break
+                    except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused) as e:
+                        # Rejected sender, recipient or message; smtplib has reset the session, keep it
+                        print(f"Email sending failed: {e}")
+                        break
+                    except OSError as e:
+                        # SMTPServerDisconnected, socket errors and any other SMTPException (all OSErrors):
+                        # the session is gone or unreliable, so retry on a fresh one
+                        if server is not None:
+                            self._quit(server)
+                            server = None
+                        if attempt:
+                            print(f"Email sending failed: {e}")
+                    except Exception as e:
+                        print(f"Email sending failed: {e}")
+                        break
+                if sent == sent_before and failed is not None:
+                    failed.append(msg['To'])
+        finally:
+            if server is not None:
+                self._checkin(server)
+        
+        return sent
     
     def send_email(self, to_email, subject, body, html=False):
         """
@@ -28,63 +201,64 @@ class EmailService:
             print(f"Email service disabled. Would send to {to_email}: {subject}")
             return False
         
-        try:
-            msg = MIMEMultipart('alternative')
-            msg['From'] = self.email
-            msg['To'] = to_email
-            msg['Subject'] = subject
-            
-            if html:
-                msg.attach(MIMEText(body, 'html'))
-            else:
-                msg.attach(MIMEText(body, 'plain'))
-            
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.email, self.password)
-                server.send_message(msg)
-            
-            return True
-        except Exception as e:
-            print(f"Email sending failed: {e}")
-            return False
+        return self._deliver([self._build_message(to_email, subject, body, html)]) == 1
     
-    def send_welcome_email(self, to_email, name, role):
+    def send_bulk(self, messages, html=False):
         """
-        Send welcome email to new user
+        Send many (to_email, subject, body) messages over one SMTP session
+        Returns the number sent
+        """
+        if not self.enabled:
+            for to_email, subject, _ in messages:
+                print(f"Email service disabled. Would send to {to_email}: {subject}")
+            return 0
+        
+        return self._deliver(self._build_message(to_email, subject, body, html)
+                             for to_email, subject, body in messages)
+    
+    def send_same(self, recipients, subject, body, html=False, failed=None):
         """
-        subject = "Welcome to Smart Food Donation System"
+        Send one subject/body to many recipients over one SMTP session
+        Returns the number sent; recipients that were not sent to are appended to failed, if given
+        """
+        if not self.enabled:
+            for to_email in recipients:
+                print(f"Email service disabled. Would send to {to_email}: {subject}")
+            if failed is not None:
+                failed.extend(recipients)
+            return 0
         
-        body = f"""
-        Dear {name},
+        return self._deliver(self._shared_messages(recipients, subject, body, html), failed)
+    
+    # Templates are split into literals and fields once at import; each send only joins in its values
+    WELCOME_SUBJECT = CompiledTemplate("Welcome to Smart Food Donation System")
+    WELCOME_BODY = CompiledTemplate("""
+        Dear $name,
         
         Welcome to Smart Food Donation System!
         
-        Your account has been successfully created as a {role}.
+        Your account has been successfully created as a $role.
         
-        {"As a donor, you can now start posting food donations and make a difference in your community." if role == 'donor' else 'As an NGO, please complete your profile to start receiving donation requests.'}
+        $next_step
         
         Together, we can reduce food waste and feed those in need.
         
         Best regards,
         Smart Food Donation Team
-        """
-        
-        return self.send_email(to_email, subject, body)
+        """)
+    WELCOME_NEXT_STEP = {
+        'donor': "As a donor, you can now start posting food donations and make a difference in your community.",
+    }
+    WELCOME_NEXT_STEP_DEFAULT = "As an NGO, please complete your profile to start receiving donation requests."
     
-    def send_donation_posted_alert(self, ngo_emails, donation_details):
-        """
-        Alert nearby NGOs about new donation
-        """
-        subject = f"New Food Donation Available: {donation_details['food_name']}"
-        
-        body = f"""
+    DONATION_POSTED_SUBJECT = CompiledTemplate("New Food Donation Available: $food_name")
+    DONATION_POSTED_BODY = CompiledTemplate("""
         A new food donation has been posted in your area!
         
-        Food Item: {donation_details['food_name']}
-        Quantity: {donation_details['quantity']}
-        Location: {donation_details['location']}
-        Best Before: {donation_details['expiry_time']}
+        Food Item: $food_name
+        Quantity: $quantity
+        Location: $location
+        Best Before: $expiry_time
         
         Log in to the platform to request pickup.
         
@@ -92,26 +266,14 @@ class EmailService:
         
         Best regards,
         Smart Food Donation Team
-        """
-        
-        success_count = 0
-        for email in ngo_emails:
-            if self.send_email(email, subject, body):
-                success_count += 1
-        
-        return success_count
+        """)
     
-    def send_request_received_notification(self, donor_email, ngo_name, donation_name):
-        """
-        Notify donor about pickup request
-        """
-        subject = f"Pickup Request Received for {donation_name}"
-        
-        body = f"""
+    REQUEST_RECEIVED_SUBJECT = CompiledTemplate("Pickup Request Received for $donation_name")
+    REQUEST_RECEIVED_BODY = CompiledTemplate("""
         Good news! Your donation has received a pickup request.
         
-        NGO: {ngo_name}
-        Donation: {donation_name}
+        NGO: $ngo_name
+        Donation: $donation_name
         
         Please log in to accept or reject the request.
         
@@ -119,46 +281,32 @@ class EmailService:
         
         Best regards,
         Smart Food Donation Team
-        """
-        
-        return self.send_email(donor_email, subject, body)
+        """)
     
-    def send_request_accepted_notification(self, ngo_email, donation_details, donor_contact):
-        """
-        Notify NGO that their request was accepted
-        """
-        subject = f"Your Pickup Request Accepted: {donation_details['food_name']}"
-        
-        body = f"""
+    REQUEST_ACCEPTED_SUBJECT = CompiledTemplate("Your Pickup Request Accepted: $food_name")
+    REQUEST_ACCEPTED_BODY = CompiledTemplate("""
         Your pickup request has been accepted!
         
         Donation Details:
-        - Food Item: {donation_details['food_name']}
-        - Quantity: {donation_details['quantity']}
-        - Location: {donation_details['location']}
-        - Best Before: {donation_details['expiry_time']}
+        - Food Item: $food_name
+        - Quantity: $quantity
+        - Location: $location
+        - Best Before: $expiry_time
         
-        Donor Contact: {donor_contact}
+        Donor Contact: $donor_contact
         
         Please coordinate with the donor for pickup.
         
         Best regards,
         Smart Food Donation Team
-        """
-        
-        return self.send_email(ngo_email, subject, body)
+        """)
     
-    def send_expiry_warning(self, donor_email, donation_name, hours_left):
-        """
-        Warn donor about expiring donation
-        """
-        subject = f"⚠️ Donation Expiring Soon: {donation_name}"
-        
-        body = f"""
+    EXPIRY_WARNING_SUBJECT = CompiledTemplate("⚠️ Donation Expiring Soon: $donation_name")
+    EXPIRY_WARNING_BODY = CompiledTemplate("""
         Your donation is expiring soon!
         
-        Donation: {donation_name}
-        Time Left: {hours_left} hours
+        Donation: $donation_name
+        Time Left: $hours_left hours
         
         If no NGO has claimed it yet, consider:
         1. Extending the expiry time
@@ -169,20 +317,13 @@ class EmailService:
         
         Best regards,
         Smart Food Donation Team
-        """
-        
-        return self.send_email(donor_email, subject, body)
+        """)
     
-    def send_completion_notification(self, donor_email, ngo_email, donation_name):
-        """
-        Notify both parties about successful completion
-        """
-        # Email to donor
-        donor_subject = f"✅ Donation Completed: {donation_name}"
-        donor_body = f"""
+    DONOR_COMPLETED_SUBJECT = CompiledTemplate("✅ Donation Completed: $donation_name")
+    DONOR_COMPLETED_BODY = CompiledTemplate("""
         Great news! Your donation has been successfully collected.
         
-        Donation: {donation_name}
+        Donation: $donation_name
         
         Thank you for making a difference in someone's life!
         Your contribution helps reduce food waste and feed those in need.
@@ -191,14 +332,13 @@ class EmailService:
         
         Best regards,
         Smart Food Donation Team
-        """
-        
-        # Email to NGO
-        ngo_subject = f"✅ Pickup Completed: {donation_name}"
-        ngo_body = f"""
+        """)
+    
+    NGO_COMPLETED_SUBJECT = CompiledTemplate("✅ Pickup Completed: $donation_name")
+    NGO_COMPLETED_BODY = CompiledTemplate("""
         Thank you for completing the pickup!
         
-        Donation: {donation_name}
+        Donation: $donation_name
         
         Your dedication helps us fight hunger and reduce food waste.
         
@@ -206,21 +346,13 @@ class EmailService:
         
         Best regards,
         Smart Food Donation Team
-        """
-        
-        self.send_email(donor_email, donor_subject, donor_body)
-        self.send_email(ngo_email, ngo_subject, ngo_body)
+        """)
     
-    def send_ngo_verification_notification(self, ngo_email, organization_name, approved=True):
-        """
-        Notify NGO about verification status
-        """
-        if approved:
-            subject = f"✅ NGO Verified: {organization_name}"
-            body = f"""
+    NGO_APPROVED_SUBJECT = CompiledTemplate("✅ NGO Verified: $organization_name")
+    NGO_APPROVED_BODY = CompiledTemplate("""
             Congratulations! Your NGO has been verified.
             
-            Organization: {organization_name}
+            Organization: $organization_name
             
             You can now:
             - Browse available food donations
@@ -231,10 +363,10 @@ class EmailService:
             
             Best regards,
             Smart Food Donation Team
-            """
-        else:
-            subject = f"NGO Verification Update: {organization_name}"
-            body = f"""
+            """)
+    
+    NGO_PENDING_SUBJECT = CompiledTemplate("NGO Verification Update: $organization_name")
+    NGO_PENDING_BODY = CompiledTemplate("""
             Thank you for registering with Smart Food Donation System.
             
             Your NGO verification is currently under review.
@@ -244,31 +376,24 @@ class EmailService:
             
             Best regards,
             Smart Food Donation Team
-            """
-        
-        return self.send_email(ngo_email, subject, body)
+            """)
     
-    def send_monthly_impact_report(self, email, name, stats):
-        """
-        Send monthly impact report to users
-        """
-        subject = f"Your Monthly Impact Report - {datetime.now().strftime('%B %Y')}"
+    MONTHLY_REPORT_SUBJECT = CompiledTemplate("Your Monthly Impact Report - $month")
+    MONTHLY_REPORT_BODY = CompiledTemplate("""
+        Dear $name,
         
-        body = f"""
-        Dear {name},
-        
-        Here's your impact summary for {datetime.now().strftime('%B %Y')}:
+        Here's your impact summary for $month:
         
         📊 Your Statistics:
-        - Total Donations: {stats.get('total_donations', 0)}
-        - Completed Pickups: {stats.get('completed', 0)}
-        - Estimated Meals Served: {stats.get('meals_served', 0)}
-        - Food Saved: {stats.get('food_saved_kg', 0)} kg
+        - Total Donations: $total_donations
+        - Completed Pickups: $completed
+        - Estimated Meals Served: $meals_served
+        - Food Saved: $food_saved_kg kg
         
         🌟 Community Impact:
-        - Active Donors: {stats.get('community_donors', 0)}
-        - Active NGOs: {stats.get('community_ngos', 0)}
-        - Total Community Meals: {stats.get('community_meals', 0)}
+        - Active Donors: $community_donors
+        - Active NGOs: $community_ngos
+        - Total Community Meals: $community_meals
         
         Thank you for being part of our mission to reduce food waste!
         
@@ -276,9 +401,128 @@ class EmailService:
         
         Best regards,
         Smart Food Donation Team
+        """)
+    MONTHLY_REPORT_STATS = ('total_donations', 'completed', 'meals_served', 'food_saved_kg',
+                            'community_donors', 'community_ngos', 'community_meals')
+    
+    def send_welcome_email(self, to_email, name, role):
+        """
+        Send welcome email to new user
         """
+        subject = self.WELCOME_SUBJECT.substitute()
+        body = self.WELCOME_BODY.substitute(
+            name=name, role=role,
+            next_step=self.WELCOME_NEXT_STEP.get(role, self.WELCOME_NEXT_STEP_DEFAULT))
         
-        return self.send_email(email, subject, body)
+        return self.send_email(to_email, subject, body)
+    
+    def send_donation_posted_alert(self, ngo_emails, donation_details):
+        """
+        Alert nearby NGOs about new donation
+        Every NGO gets the same body, so it is rendered once and shared
+        Returns True when every NGO was sent to, otherwise {'ngo_emails': [...]}
+        naming the ones to retry
+        """
+        subject = self.DONATION_POSTED_SUBJECT.substitute(donation_details)
+        body = self.DONATION_POSTED_BODY.substitute(donation_details)
+        
+        failed = []
+        self.send_same(ngo_emails, subject, body, failed=failed)
+        return {'ngo_emails': failed} if failed else True
+    
+    def send_request_received_notification(self, donor_email, ngo_name, donation_name):
+        """
+        Notify donor about pickup request
+        """
+        subject = self.REQUEST_RECEIVED_SUBJECT.substitute(donation_name=donation_name)
+        body = self.REQUEST_RECEIVED_BODY.substitute(ngo_name=ngo_name, donation_name=donation_name)
+        
+        return self.send_email(donor_email, subject, body)
+    
+    def send_request_accepted_notification(self, ngo_email, donation_details, donor_contact):
+        """
+        Notify NGO that their request was accepted
+        """
+        subject = self.REQUEST_ACCEPTED_SUBJECT.substitute(donation_details)
+        body = self.REQUEST_ACCEPTED_BODY.substitute(donation_details, donor_contact=donor_contact)
+        
+        return self.send_email(ngo_email, subject, body)
+    
+    def send_expiry_warning(self, donor_email, donation_name, hours_left):
+        """
+        Warn donor about expiring donation
+        """
+        subject = self.EXPIRY_WARNING_SUBJECT.substitute(donation_name=donation_name)
+        body = self.EXPIRY_WARNING_BODY.substitute(donation_name=donation_name, hours_left=hours_left)
+        
+        return self.send_email(donor_email, subject, body)
+    
+    def send_donor_completion_notification(self, donor_email, donation_name):
+        """
+        Tell the donor their donation was collected
+        """
+        return self.send_email(donor_email,
+                               self.DONOR_COMPLETED_SUBJECT.substitute(donation_name=donation_name),
+                               self.DONOR_COMPLETED_BODY.substitute(donation_name=donation_name))
+    
+    def send_ngo_completion_notification(self, ngo_email, donation_name):
+        """
+        Confirm a completed pickup to the NGO
+        """
+        return self.send_email(ngo_email,
+                               self.NGO_COMPLETED_SUBJECT.substitute(donation_name=donation_name),
+                               self.NGO_COMPLETED_BODY.substitute(donation_name=donation_name))
+    
+    def send_completion_notification(self, donor_email, ngo_email, donation_name):
+        """
+        Notify both parties about successful completion
+        Returns the number sent; the outbox queues the two halves separately
+        """
+        return self.send_bulk([
+            (donor_email,
+             self.DONOR_COMPLETED_SUBJECT.substitute(donation_name=donation_name),
+             self.DONOR_COMPLETED_BODY.substitute(donation_name=donation_name)),
+            (ngo_email,
+             self.NGO_COMPLETED_SUBJECT.substitute(donation_name=donation_name),
+             self.NGO_COMPLETED_BODY.substitute(donation_name=donation_name)),
+        ])
+    
+    def send_ngo_verification_notification(self, ngo_email, organization_name, approved=True):
+        """
+        Notify NGO about verification status
+        """
+        if approved:
+            subject = self.NGO_APPROVED_SUBJECT.substitute(organization_name=organization_name)
+            body = self.NGO_APPROVED_BODY.substitute(organization_name=organization_name)
+        else:
+            subject = self.NGO_PENDING_SUBJECT.substitute(organization_name=organization_name)
+            body = self.NGO_PENDING_BODY.substitute()
+        
+        return self.send_email(ngo_email, subject, body)
+    
+    def render_monthly_impact_reports(self, reports, month=None):
+        """
+        Yield (to_email, subject, body) for each (email, name, stats) in reports
+        """
+        month = month or datetime.now().strftime('%B %Y')
+        subject = self.MONTHLY_REPORT_SUBJECT.substitute(month=month)
+        
+        for email, name, stats in reports:
+            values = {key: stats.get(key, 0) for key in self.MONTHLY_REPORT_STATS}
+            yield email, subject, self.MONTHLY_REPORT_BODY.substitute(values, name=name, month=month)
+    
+    def send_monthly_impact_report(self, email, name, stats):
+        """
+        Send monthly impact report to users
+        """
+        return self.send_monthly_impact_reports([(email, name, stats)]) == 1
+    
+    def send_monthly_impact_reports(self, reports):
+        """
+        Send the monthly report to every (email, name, stats) in reports over one session
+        Returns the number sent
+        """
+        return self.send_bulk(self.render_monthly_impact_reports(reports))
 
 # Example usage
 if __name__ == "__main__":
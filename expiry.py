@@ -0,0 +1,107 @@
+"""
+Expiry Scheduler
+Retires pending donations once their expiry_time passes and queues expiry
+warnings to donors at configurable lead times before it
+
+Run standalone with: python expiry.py
+Lead times come from EXPIRY_WARNING_HOURS (comma separated, default "6,1")
+"""
+
+import os
+from datetime import datetime, timedelta
+
+from database import PeriodicWorker
+from notifications import enqueue_many
+
+WARNING_LEAD_HOURS = tuple(float(hours) for hours in os.environ.get('EXPIRY_WARNING_HOURS', '6,1').split(',') if hours.strip())
+
+# expiry_time is stored as local time by the app, so the scheduler compares against local time too
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def expire_donations(conn, now, batch_size=500):
+    """
+    Move pending donations past their expiry_time to 'expired', batch_size rows per transaction
+    Their pending pickup requests expire with them and their match suggestions are dropped
+    Returns the number of donations expired
+    """
+    c = conn.cursor()
+    expired = 0
+    while True:
+        # idx_donations_status_expiry turns this into a range scan over exactly the rows that change
+        c.execute('''SELECT donation_id FROM donations
+                     WHERE status = 'pending' AND expiry_time <= ?
+                     LIMIT ?''', (now.strftime(TIMESTAMP_FORMAT), batch_size))
+        donation_ids = [(row[0],) for row in c.fetchall()]
+
+        c.executemany("UPDATE donations SET status = 'expired' WHERE donation_id = ?", donation_ids)
+        c.executemany("UPDATE requests SET status = 'expired' WHERE donation_id = ? AND status = 'pending'", donation_ids)
+        c.executemany("DELETE FROM match_suggestions WHERE donation_id = ?", donation_ids)
+        conn.commit()
+        expired += len(donation_ids)
+        if len(donation_ids) < batch_size:
+            return expired
+
+
+def queue_expiry_warnings(conn, now, lead_hours=WARNING_LEAD_HOURS):
+    """
+    Queue a warning for every pending donation that crossed a lead time since the last tick
+    Returns the number of warnings queued
+    """
+    c = conn.cursor()
+    c.execute("SELECT value FROM scheduler_state WHERE name = 'expiry_warned_through'")
+    row = c.fetchone()
+    # First run only looks forward; donations already inside a window are not warned retroactively
+    warned_through = datetime.strptime(row[0], TIMESTAMP_FORMAT) if row else now
+
+    calls = []
+    for hours in lead_hours:
+        lead = timedelta(hours=hours)
+        # Only expiry times that entered the (warned_through, now] + lead window since the last tick
+        c.execute('''SELECT u.email, d.food_name
+                     FROM donations d
+                     JOIN users u ON u.user_id = d.donor_id
+                     WHERE d.status = 'pending' AND d.expiry_time > ? AND d.expiry_time <= ? AND d.expiry_time > ?''',
+                  ((warned_through + lead).strftime(TIMESTAMP_FORMAT),
+                   (now + lead).strftime(TIMESTAMP_FORMAT),
+                   now.strftime(TIMESTAMP_FORMAT)))
+        calls.extend(('send_expiry_warning', {'donor_email': email, 'donation_name': food_name,
+                                              'hours_left': f"{hours:g}"})
+                     for email, food_name in c.fetchall())
+
+    enqueue_many(conn, calls)
+    c.execute('''INSERT INTO scheduler_state (name, value) VALUES ('expiry_warned_through', ?)
+                 ON CONFLICT(name) DO UPDATE SET value = excluded.value''', (now.strftime(TIMESTAMP_FORMAT),))
+    conn.commit()
+    return len(calls)
+
+
+class ExpiryScheduler(PeriodicWorker):
+    name = "expiry-scheduler"
+
+    def __init__(self, pool, lead_hours=WARNING_LEAD_HOURS, batch_size=500, interval=60.0):
+        """
+        Initialize expiry scheduler
+        Every interval seconds, expires overdue donations and queues warnings;
+        each tick only touches donations whose state changes
+        """
+        super().__init__(pool, interval)
+        self.lead_hours = lead_hours
+        self.batch_size = batch_size
+
+    def tick(self, now=None):
+        """
+        Run one pass; returns (donations expired, warnings queued)
+        """
+        now = (now or datetime.now()).replace(microsecond=0)
+        with self.pool.connection() as conn:
+            warned = queue_expiry_warnings(conn, now, self.lead_hours)
+            expired = expire_donations(conn, now, self.batch_size)
+        return expired, warned
+
+    def step(self):
+        self.tick()
+
+
+if __name__ == "__main__":
+    ExpiryScheduler.run_standalone()
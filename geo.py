@@ -0,0 +1,108 @@
+"""
+Geospatial Helpers
+Distance and bounding-box utilities for locating donations and NGOs
+"""
+
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance between two points in kilometres
+    """
+    if None in (lat1, lon1, lat2, lon2):
+        return None
+
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def haversine_matrix_km(lats1, lons1, lats2, lons2):
+    """
+    Great-circle distances in kilometres between every point in the first set
+    and every point in the second, as a len(lats1) x len(lats2) array
+    """
+    phi1 = np.radians(np.asarray(lats1, dtype=float))[:, None]
+    phi2 = np.radians(np.asarray(lats2, dtype=float))[None, :]
+    d_lambda = np.radians(np.asarray(lons2, dtype=float))[None, :] - np.radians(np.asarray(lons1, dtype=float))[:, None]
+
+    a = np.sin((phi2 - phi1) / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+def points_within_km(lat, lon, lats, lons, radius_km):
+    """
+    Distances in kilometres from (lat, lon) to every point, and a mask of
+    those within radius_km, as two arrays aligned with lats/lons
+    """
+    distances = haversine_matrix_km([lat], [lon], lats, lons)[0]
+    return distances, distances <= radius_km
+
+
+def zoom_for_radius(lat, radius_km, width_px=700):
+    """
+    Largest web-map zoom level at which a circle of radius_km around
+    latitude lat still fits across a map width_px pixels wide
+    """
+    metres_per_px_at_zoom0 = 2 * math.pi * EARTH_RADIUS_KM * 1000 * math.cos(math.radians(lat)) / 256
+    return max(0, min(20, int(math.log2(metres_per_px_at_zoom0 * width_px / (2 * radius_km * 1000)))))
+
+
+def grid_clusters(lats, lons, zoom, cell_px=48):
+    """
+    Group points into square grid cells about cell_px pixels wide at the given
+    web-map zoom level, so coarser zooms merge more points per cell
+    Returns (centroid_lats, centroid_lons, counts, cell_km), one entry per occupied cell
+    """
+    lats, lons = np.asarray(lats, dtype=float), np.asarray(lons, dtype=float)
+    if lats.size == 0:
+        return np.empty(0), np.empty(0), np.empty(0, dtype=np.int64), 0.0
+
+    # Web-map pixels are equal in longitude; shrink the latitude step so cells stay square on the ground
+    cell_lon = cell_px * 360 / (256 * 2 ** zoom)
+    cell_lat = cell_lon * math.cos(math.radians(float(lats.mean())))
+
+    # One integer key per cell; column indexes stay well inside ±2**31 even at zoom 20
+    rows = np.floor(lats / cell_lat).astype(np.int64)
+    cols = np.floor(lons / cell_lon).astype(np.int64)
+    _, cell_of, counts = np.unique(rows * 2 ** 32 + cols, return_inverse=True, return_counts=True)
+    centroid_lats = np.bincount(cell_of, weights=lats) / counts
+    centroid_lons = np.bincount(cell_of, weights=lons) / counts
+    return centroid_lats, centroid_lons, counts, cell_lat * KM_PER_DEGREE_LAT
+
+
+def bounding_box(lat, lon, radius_km):
+    """
+    Smallest lat/lon box containing every point within radius_km of (lat, lon)
+    Returns (min_lat, max_lat, min_lon, max_lon)
+    """
+    d_lat = radius_km / KM_PER_DEGREE_LAT
+    min_lat, max_lat = lat - d_lat, lat + d_lat
+
+    # Near the poles or across the antimeridian the longitude span degenerates,
+    # so fall back to the full longitude range
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0
+
+    d_lon = math.degrees(math.asin(min(1.0, math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(lat)))))
+    min_lon, max_lon = lon - d_lon, lon + d_lon
+    if min_lon < -180 or max_lon > 180:
+        return min_lat, max_lat, -180.0, 180.0
+
+    return min_lat, max_lat, min_lon, max_lon
+
+
+def register_sql_functions(conn):
+    """
+    Expose haversine_km(lat1, lon1, lat2, lon2) to SQL on this connection
+    """
+    conn.create_function("haversine_km", 4, haversine_km, deterministic=True)
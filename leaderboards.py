@@ -0,0 +1,117 @@
+"""
+Leaderboards
+Top donors by completed donations and top NGOs by completed pickups,
+snapshotted per period in batch so the Leaderboard tab is a range read
+"""
+
+from datetime import datetime, timedelta
+
+from database import PeriodicWorker
+
+BOARDS = ("donors", "ngos")
+PERIODS = ("weekly", "monthly", "all_time")
+TOP_K = 10
+
+
+def period_start(period, now):
+    """
+    First moment of the current week (Monday) or month, as a timestamp string
+    comparable with collected_at; None for all_time
+    """
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "weekly":
+        start = today - timedelta(days=today.weekday())
+    elif period == "monthly":
+        start = today.replace(day=1)
+    else:
+        return None
+    return start.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _ranked(conn, board, period, since, top_k):
+    """
+    (entity_id, name, score) for the top_k entries of one board and period
+    """
+    c = conn.cursor()
+    if period == "all_time" and board == "donors":
+        # Walks idx_users_completed_donations from the top (rowid breaks ties); no aggregation or sort
+        c.execute('''SELECT user_id, full_name, completed_donations FROM users
+                     WHERE completed_donations > 0
+                     ORDER BY completed_donations DESC, user_id DESC
+                     LIMIT ?''', (top_k,))
+    elif period == "all_time":
+        c.execute('''SELECT ngo_id, organization_name, total_pickups FROM ngo_profiles
+                     WHERE verified = 1 AND total_pickups > 0
+                     ORDER BY total_pickups DESC, ngo_id DESC
+                     LIMIT ?''', (top_k,))
+    elif board == "donors":
+        c.execute('''SELECT d.donor_id, u.full_name, COUNT(*) AS score
+                     FROM requests r
+                     JOIN donations d ON d.donation_id = r.donation_id
+                     JOIN users u ON u.user_id = d.donor_id
+                     WHERE r.status = 'completed' AND r.collected_at >= ?
+                     GROUP BY d.donor_id
+                     ORDER BY score DESC, d.donor_id
+                     LIMIT ?''', (since, top_k))
+    else:
+        c.execute('''SELECT r.ngo_id, n.organization_name, COUNT(*) AS score
+                     FROM requests r
+                     JOIN ngo_profiles n ON n.ngo_id = r.ngo_id
+                     WHERE r.status = 'completed' AND r.collected_at >= ? AND n.verified = 1
+                     GROUP BY r.ngo_id
+                     ORDER BY score DESC, r.ngo_id
+                     LIMIT ?''', (since, top_k))
+    return c.fetchall()
+
+
+def snapshot_leaderboards(conn, now=None, top_k=TOP_K):
+    """
+    Recompute every board for every period and replace the stored snapshots
+    in one transaction, so readers never see a half-written board
+    """
+    now = now or datetime.now()
+    computed_at = now.strftime("%Y-%m-%d %H:%M:%S")
+    rows = []
+    for board in BOARDS:
+        for period in PERIODS:
+            since = period_start(period, now)
+            for rank, (entity_id, name, score) in enumerate(_ranked(conn, board, period, since, top_k), 1):
+                rows.append((board, period, rank, entity_id, name, score, since, computed_at))
+
+    c = conn.cursor()
+    c.execute("DELETE FROM leaderboard_snapshots")
+    c.executemany('''INSERT INTO leaderboard_snapshots
+                     (board, period, rank, entity_id, name, score, period_start, computed_at)
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', rows)
+    conn.commit()
+    return len(rows)
+
+
+def read_leaderboard(conn, board, period):
+    """
+    Stored ranking for one board and period: ([(rank, name, score), ...], computed_at)
+    """
+    c = conn.cursor()
+    c.execute('''SELECT rank, name, score, computed_at FROM leaderboard_snapshots
+                 WHERE board = ? AND period = ?
+                 ORDER BY rank''', (board, period))
+    rows = c.fetchall()
+    return [row[:3] for row in rows], (rows[0][3] if rows else None)
+
+
+class LeaderboardWorker(PeriodicWorker):
+    name = "leaderboard-worker"
+
+    def __init__(self, pool, interval=600.0):
+        """
+        Initialize leaderboard worker; re-snapshots every interval seconds
+        """
+        super().__init__(pool, interval)
+
+    def step(self):
+        with self.pool.connection() as conn:
+            snapshot_leaderboards(conn)
+
+
+if __name__ == "__main__":
+    LeaderboardWorker.run_standalone()
@@ -0,0 +1,163 @@
+"""
+Donation Matching
+Periodically assigns unclaimed pending donations to verified NGOs with spare
+capacity, preferring short trips and donations closest to expiry, and stores
+the result as suggestions for the donor and NGO dashboards
+
+Run standalone with: python matching.py
+"""
+
+from datetime import datetime
+
+import numpy as np
+
+from database import PeriodicWorker
+from geo import haversine_matrix_km
+from notifications import ALERT_RADIUS_KM, PICKUPS_TODAY_SQL, pickup_slots_sql
+
+# Assumed door-to-door pickup speed when checking a trip can beat the expiry time
+PICKUP_SPEED_KMH = 20.0
+
+# Cost of one hour of remaining shelf life, in kilometres of travel: a donation
+# expiring in 2 hours outranks one expiring in 10 unless it is 8 * 2 km further away
+EXPIRY_WEIGHT_KM_PER_HOUR = 2.0
+
+# Shelf life beyond this many hours no longer changes a donation's priority
+EXPIRY_HORIZON_HOURS = 48.0
+
+
+def cost_matrix(donation_lats, donation_lons, hours_left, ngo_lats, ngo_lons, radius_km=ALERT_RADIUS_KM):
+    """
+    donations x NGOs matrix of (cost, distance_km)
+    Pairs further than radius_km apart, or too far to reach before the
+    donation expires, cost infinity
+    """
+    distance = haversine_matrix_km(donation_lats, donation_lons, ngo_lats, ngo_lons)
+    hours_left = np.asarray(hours_left, dtype=float)[:, None]
+
+    urgency = EXPIRY_WEIGHT_KM_PER_HOUR * np.minimum(hours_left, EXPIRY_HORIZON_HOURS)
+    cost = distance + urgency
+    cost[(distance > radius_km) | (distance / PICKUP_SPEED_KMH >= hours_left)] = np.inf
+    return cost, distance
+
+
+def assign(cost, slots):
+    """
+    Capacity-constrained assignment of rows (donations) to columns (NGOs)
+    slots[j] is how many donations NGO j can take
+    Returns an array holding each donation's NGO column, or -1 if unmatched
+
+    Deferred acceptance: every unmatched donation proposes to its cheapest NGO
+    that has not turned it down, and each NGO holds its slots[j] cheapest
+    proposals so far, releasing the rest to propose again. Each round is a
+    handful of vectorised passes over the proposers. With one shared cost
+    matrix the result equals taking pairs greedily in order of cost.
+    """
+    cost = np.array(cost, dtype=float)
+    slots = np.array(slots, dtype=int)
+    cost[:, slots <= 0] = np.inf
+    assigned = np.full(cost.shape[0], -1)
+
+    # Each donation's NGOs from cheapest to dearest; unreachable ones sort last
+    preferences = cost.argsort(axis=1)
+    next_choice = np.zeros(cost.shape[0], dtype=int)
+    proposers = np.flatnonzero(np.isfinite(cost).any(axis=1))
+
+    while proposers.size:
+        choice = preferences[proposers, next_choice[proposers]]
+        reachable = np.isfinite(cost[proposers, choice])
+        proposers, choice = proposers[reachable], choice[reachable]
+        if not proposers.size:
+            break
+
+        # Pool the new proposals with those already held, grouped by NGO and cheapest first
+        held = np.flatnonzero(assigned >= 0)
+        candidates = np.concatenate([held, proposers])
+        ngo = np.concatenate([assigned[held], choice])
+        order = np.lexsort((cost[candidates, ngo], ngo))
+        candidates, ngo = candidates[order], ngo[order]
+        rank = np.arange(ngo.size) - np.searchsorted(ngo, ngo, side='left')
+        keep = rank < slots[ngo]
+
+        assigned[candidates[keep]] = ngo[keep]
+        released = candidates[~keep]
+        assigned[released] = -1
+        # A released donation moves on to its next cheapest NGO
+        next_choice[released] += 1
+        proposers = released[next_choice[released] < cost.shape[1]]
+
+    return assigned
+
+
+def load_candidates(conn, now):
+    """
+    Pending donations nobody has requested yet, and verified NGOs with free daily slots
+    """
+    c = conn.cursor()
+    c.execute('''SELECT d.donation_id, d.latitude, d.longitude, d.expiry_time
+                 FROM donations d
+                 WHERE d.status = 'pending' AND d.expiry_time > ?
+                   AND NOT EXISTS (SELECT 1 FROM requests r
+                                   WHERE r.donation_id = d.donation_id AND r.status IN ('pending', 'accepted'))''',
+              (now.strftime('%Y-%m-%d %H:%M:%S'),))
+    donations = c.fetchall()
+
+    # Same capacity rule as new-donation alerts: each of today's pickups uses MEALS_PER_DONATION meals
+    today = now.strftime('%Y-%m-%d')
+    c.execute(f'''SELECT n.ngo_id, n.latitude, n.longitude,
+                         {pickup_slots_sql("COALESCE(n.capacity, 50)")} - ({PICKUPS_TODAY_SQL})
+                  FROM ngo_profiles n
+                  WHERE n.verified = 1 AND n.latitude IS NOT NULL AND n.longitude IS NOT NULL''',
+              (today, today))
+    ngos = [row for row in c.fetchall() if row[3] > 0]
+
+    return donations, ngos
+
+
+def run_matching(conn, now=None, radius_km=ALERT_RADIUS_KM):
+    """
+    Recompute every suggestion in one transaction; returns the number of matches
+    """
+    now = now or datetime.now()
+    donations, ngos = load_candidates(conn, now)
+
+    matches = []
+    if donations and ngos:
+        donation_ids = np.array([row[0] for row in donations])
+        hours_left = np.array([(datetime.fromisoformat(str(row[3])) - now).total_seconds() / 3600
+                               for row in donations])
+        ngo_ids = np.array([row[0] for row in ngos])
+
+        cost, distance = cost_matrix([row[1] for row in donations], [row[2] for row in donations], hours_left,
+                                     [row[1] for row in ngos], [row[2] for row in ngos], radius_km)
+        assigned = assign(cost, [row[3] for row in ngos])
+
+        matched = np.flatnonzero(assigned >= 0)
+        matches = [(int(donation_ids[i]), int(ngo_ids[assigned[i]]),
+                    round(float(distance[i, assigned[i]]), 2), round(float(cost[i, assigned[i]]), 2))
+                   for i in matched]
+
+    c = conn.cursor()
+    c.execute("DELETE FROM match_suggestions")
+    c.executemany('''INSERT INTO match_suggestions (donation_id, ngo_id, distance_km, cost)
+                     VALUES (?, ?, ?, ?)''', matches)
+    conn.commit()
+    return len(matches)
+
+
+class MatchingWorker(PeriodicWorker):
+    name = "matching-worker"
+
+    def __init__(self, pool, interval=300.0):
+        """
+        Initialize matching worker; re-solves every interval seconds
+        """
+        super().__init__(pool, interval)
+
+    def step(self):
+        with self.pool.connection() as conn:
+            run_matching(conn)
+
+
+if __name__ == "__main__":
+    MatchingWorker.run_standalone()
@@ -0,0 +1,565 @@
+"""
+Schema Migrations
+Versioned schema upgrades applied idempotently at startup
+"""
+
+from blob_store import BlobStore, migrate_base64_columns
+from stats import rebuild_daily_rollups, rebuild_platform_stats
+from streaks import backfill_streaks
+
+
+def _create_base_tables(conn):
+    c = conn.cursor()
+    
+    # Users table
+    c.execute('''CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        full_name TEXT NOT NULL,
+        phone TEXT,
+        role TEXT CHECK(role IN ('donor', 'ngo', 'admin')),
+        status TEXT DEFAULT 'active',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        verified INTEGER DEFAULT 0,
+        profile_pic TEXT,
+        total_donations INTEGER DEFAULT 0,
+        streak_days INTEGER DEFAULT 0,
+        last_donation_date DATE
+    )''')
+    
+    # NGO Profiles
+    c.execute('''CREATE TABLE IF NOT EXISTS ngo_profiles (
+        ngo_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER UNIQUE,
+        organization_name TEXT NOT NULL,
+        registration_number TEXT UNIQUE,
+        address TEXT NOT NULL,
+        latitude REAL,
+        longitude REAL,
+        verified INTEGER DEFAULT 0,
+        capacity INTEGER DEFAULT 50,
+        total_pickups INTEGER DEFAULT 0,
+        rating REAL DEFAULT 5.0,
+        FOREIGN KEY (user_id) REFERENCES users(user_id)
+    )''')
+    
+    # Donations table with image support
+    c.execute('''CREATE TABLE IF NOT EXISTS donations (
+        donation_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        donor_id INTEGER NOT NULL,
+        food_name TEXT NOT NULL,
+        quantity TEXT NOT NULL,
+        food_type TEXT,
+        expiry_time TIMESTAMP NOT NULL,
+        location TEXT NOT NULL,
+        latitude REAL NOT NULL,
+        longitude REAL NOT NULL,
+        image_data TEXT,
+        description TEXT,
+        status TEXT DEFAULT 'pending',
+        qr_code TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        collected_at TIMESTAMP,
+        view_count INTEGER DEFAULT 0,
+        FOREIGN KEY (donor_id) REFERENCES users(user_id)
+    )''')
+    
+    # Requests table
+    c.execute('''CREATE TABLE IF NOT EXISTS requests (
+        request_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        donation_id INTEGER NOT NULL,
+        ngo_id INTEGER NOT NULL,
+        status TEXT DEFAULT 'pending',
+        message TEXT,
+        requested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        accepted_at TIMESTAMP,
+        collected_at TIMESTAMP,
+        feedback TEXT,
+        rating INTEGER,
+        FOREIGN KEY (donation_id) REFERENCES donations(donation_id),
+        FOREIGN KEY (ngo_id) REFERENCES ngo_profiles(ngo_id)
+    )''')
+    
+    # Success Stories
+    c.execute('''CREATE TABLE IF NOT EXISTS success_stories (
+        story_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        donation_id INTEGER,
+        ngo_id INTEGER,
+        title TEXT NOT NULL,
+        story TEXT NOT NULL,
+        impact_meals INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        featured INTEGER DEFAULT 0,
+        FOREIGN KEY (donation_id) REFERENCES donations(donation_id),
+        FOREIGN KEY (ngo_id) REFERENCES ngo_profiles(ngo_id)
+    )''')
+
+
+def _create_donation_geo_index(conn):
+    # Spatial index over pending donations (points stored as zero-area boxes)
+    c = conn.cursor()
+    
+    c.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS donation_geo USING rtree(
+        donation_id,
+        min_lat, max_lat,
+        min_lon, max_lon
+    )''')
+    
+    c.execute('''CREATE TRIGGER IF NOT EXISTS donation_geo_insert AFTER INSERT ON donations
+                 WHEN NEW.status = 'pending'
+                 BEGIN
+                     INSERT INTO donation_geo VALUES (NEW.donation_id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude);
+                 END''')
+    
+    c.execute('''CREATE TRIGGER IF NOT EXISTS donation_geo_update AFTER UPDATE OF status, latitude, longitude ON donations
+                 BEGIN
+                     DELETE FROM donation_geo WHERE donation_id = OLD.donation_id;
+                     INSERT INTO donation_geo
+                         SELECT NEW.donation_id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude
+                         WHERE NEW.status = 'pending';
+                 END''')
+    
+    c.execute('''CREATE TRIGGER IF NOT EXISTS donation_geo_delete AFTER DELETE ON donations
+                 BEGIN
+                     DELETE FROM donation_geo WHERE donation_id = OLD.donation_id;
+                 END''')
+    
+    # Rebuild from the base table; databases created before versioning may already have rows
+    c.execute("DELETE FROM donation_geo")
+    c.execute('''INSERT INTO donation_geo
+                 SELECT donation_id, latitude, latitude, longitude, longitude
+                 FROM donations WHERE status = 'pending' ''')
+
+
+def _move_blobs_to_store(conn):
+    # Image and QR bytes live in the blob store; donations keep only the digest
+    c = conn.cursor()
+    add_column_if_missing(c, "donations", "image_hash", "TEXT")
+    add_column_if_missing(c, "donations", "qr_hash", "TEXT")
+    conn.commit()
+    migrate_base64_columns(conn, BlobStore())
+
+
+def _create_hot_path_indexes(conn):
+    c = conn.cursor()
+    
+    # Live feed, sidebar/home counts and status-filtered listings
+    c.execute("CREATE INDEX IF NOT EXISTS idx_donations_status_created ON donations (status, created_at)")
+    # Donor "My Donations" and donor impact queries
+    c.execute("CREATE INDEX IF NOT EXISTS idx_donations_donor_created ON donations (donor_id, created_at)")
+    # NGO "My Requests" and NGO impact queries
+    c.execute("CREATE INDEX IF NOT EXISTS idx_requests_ngo_requested ON requests (ngo_id, requested_at)")
+    # Pickup requests per donation and the per-NGO request status lookup
+    c.execute("CREATE INDEX IF NOT EXISTS idx_requests_donation_ngo ON requests (donation_id, ngo_id)")
+    # Verification queue and the Top NGOs leaderboard (user_id is already covered by its UNIQUE index)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_ngo_profiles_verified_pickups ON ngo_profiles (verified, total_pickups)")
+    # Role counts and the admin user listing
+    c.execute("CREATE INDEX IF NOT EXISTS idx_users_role_created ON users (role, created_at)")
+
+
+def _create_donation_search_index(conn):
+    # External-content FTS5 index over the searchable donation text
+    c = conn.cursor()
+    
+    c.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS donations_fts USING fts5(
+        food_name, description, location,
+        content='donations', content_rowid='donation_id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )''')
+    
+    c.execute('''CREATE TRIGGER IF NOT EXISTS donations_fts_insert AFTER INSERT ON donations
+                 BEGIN
+                     INSERT INTO donations_fts (rowid, food_name, description, location)
+                     VALUES (NEW.donation_id, NEW.food_name, NEW.description, NEW.location);
+                 END''')
+    
+    c.execute('''CREATE TRIGGER IF NOT EXISTS donations_fts_update AFTER UPDATE OF food_name, description, location ON donations
+                 BEGIN
+                     INSERT INTO donations_fts (donations_fts, rowid, food_name, description, location)
+                     VALUES ('delete', OLD.donation_id, OLD.food_name, OLD.description, OLD.location);
+                     INSERT INTO donations_fts (rowid, food_name, description, location)
+                     VALUES (NEW.donation_id, NEW.food_name, NEW.description, NEW.location);
+                 END''')
+    
+    c.execute('''CREATE TRIGGER IF NOT EXISTS donations_fts_delete AFTER DELETE ON donations
+                 BEGIN
+                     INSERT INTO donations_fts (donations_fts, rowid, food_name, description, location)
+                     VALUES ('delete', OLD.donation_id, OLD.food_name, OLD.description, OLD.location);
+                 END''')
+    
+    c.execute("INSERT INTO donations_fts (donations_fts) VALUES ('rebuild')")
+
+
+def _create_platform_stats(conn):
+    # Counters bumped by triggers, so every write path updates them in its own transaction
+    c = conn.cursor()
+    
+    c.execute('''CREATE TABLE IF NOT EXISTS platform_stats (
+        stat TEXT PRIMARY KEY NOT NULL,
+        value INTEGER NOT NULL DEFAULT 0
+    )''')
+    
+    bump = "ON CONFLICT(stat) DO UPDATE SET value = value + excluded.value"
+    
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS platform_stats_donation_insert AFTER INSERT ON donations
+                  BEGIN
+                      INSERT INTO platform_stats (stat, value)
+                      VALUES ('donations_total', 1), ('donations_' || COALESCE(NEW.status, 'unknown'), 1) {bump};
+                  END''')
+    
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS platform_stats_donation_status AFTER UPDATE OF status ON donations
+                  WHEN OLD.status IS NOT NEW.status
+                  BEGIN
+                      INSERT INTO platform_stats (stat, value)
+                      VALUES ('donations_' || COALESCE(OLD.status, 'unknown'), -1),
+                             ('donations_' || COALESCE(NEW.status, 'unknown'), 1) {bump};
+                  END''')
+    
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS platform_stats_donation_delete AFTER DELETE ON donations
+                  BEGIN
+                      INSERT INTO platform_stats (stat, value)
+                      VALUES ('donations_total', -1), ('donations_' || COALESCE(OLD.status, 'unknown'), -1) {bump};
+                  END''')
+    
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS platform_stats_user_insert AFTER INSERT ON users
+                  BEGIN
+                      INSERT INTO platform_stats (stat, value)
+                      VALUES ('users_' || COALESCE(NEW.role, 'unknown'), 1) {bump};
+                  END''')
+    
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS platform_stats_user_role AFTER UPDATE OF role ON users
+                  WHEN OLD.role IS NOT NEW.role
+                  BEGIN
+                      INSERT INTO platform_stats (stat, value)
+                      VALUES ('users_' || COALESCE(OLD.role, 'unknown'), -1),
+                             ('users_' || COALESCE(NEW.role, 'unknown'), 1) {bump};
+                  END''')
+    
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS platform_stats_user_delete AFTER DELETE ON users
+                  BEGIN
+                      INSERT INTO platform_stats (stat, value)
+                      VALUES ('users_' || COALESCE(OLD.role, 'unknown'), -1) {bump};
+                  END''')
+    
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS platform_stats_ngo_insert AFTER INSERT ON ngo_profiles
+                  WHEN NEW.verified = 1
+                  BEGIN
+                      INSERT INTO platform_stats (stat, value) VALUES ('verified_ngos', 1) {bump};
+                  END''')
+    
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS platform_stats_ngo_verified AFTER UPDATE OF verified ON ngo_profiles
+                  WHEN (OLD.verified = 1) IS NOT (NEW.verified = 1)
+                  BEGIN
+                      INSERT INTO platform_stats (stat, value)
+                      VALUES ('verified_ngos', CASE WHEN NEW.verified = 1 THEN 1 ELSE -1 END) {bump};
+                  END''')
+    
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS platform_stats_ngo_delete AFTER DELETE ON ngo_profiles
+                  WHEN OLD.verified = 1
+                  BEGIN
+                      INSERT INTO platform_stats (stat, value) VALUES ('verified_ngos', -1) {bump};
+                  END''')
+    
+    rebuild_platform_stats(conn)
+
+
+# Tables whose writes invalidate cached query results
+VERSIONED_TABLES = ("users", "ngo_profiles", "donations", "requests")
+
+
+def _create_data_versions(conn):
+    # Per-table write counters used to stamp cached query results
+    c = conn.cursor()
+    
+    c.execute('''CREATE TABLE IF NOT EXISTS data_versions (
+        table_name TEXT PRIMARY KEY NOT NULL,
+        version INTEGER NOT NULL DEFAULT 0
+    )''')
+    
+    for table in VERSIONED_TABLES:
+        c.execute("INSERT OR IGNORE INTO data_versions (table_name, version) VALUES (?, 0)", (table,))
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            c.execute(f'''CREATE TRIGGER IF NOT EXISTS data_version_{table}_{event.lower()} AFTER {event} ON {table}
+                          BEGIN
+                              UPDATE data_versions SET version = version + 1 WHERE table_name = '{table}';
+                          END''')
+
+
+def _create_pagination_indexes(conn):
+    # Keyset pagination over (created_at, id); the rowid is the implicit last index column
+    c = conn.cursor()
+    c.execute("CREATE INDEX IF NOT EXISTS idx_users_created ON users (created_at)")
+
+
+def _create_outbox(conn):
+    # Notifications queued in the same transaction as the change that triggers them
+    c = conn.cursor()
+    
+    c.execute('''CREATE TABLE IF NOT EXISTS outbox (
+        outbox_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        method TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending' CHECK(status IN ('pending', 'sending', 'sent', 'dead')),
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        claimed_at TIMESTAMP,
+        last_error TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        sent_at TIMESTAMP
+    )''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_outbox_status_next ON outbox (status, next_attempt_at)")
+
+
+def _create_ngo_geo_index(conn):
+    # Spatial index over verified NGOs with a known location, for new-donation alerts
+    c = conn.cursor()
+    
+    c.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS ngo_geo USING rtree(
+        ngo_id,
+        min_lat, max_lat,
+        min_lon, max_lon
+    )''')
+    
+    c.execute('''CREATE TRIGGER IF NOT EXISTS ngo_geo_insert AFTER INSERT ON ngo_profiles
+                 WHEN NEW.verified = 1 AND NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL
+                 BEGIN
+                     INSERT INTO ngo_geo VALUES (NEW.ngo_id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude);
+                 END''')
+    
+    c.execute('''CREATE TRIGGER IF NOT EXISTS ngo_geo_update AFTER UPDATE OF verified, latitude, longitude ON ngo_profiles
+                 BEGIN
+                     DELETE FROM ngo_geo WHERE ngo_id = OLD.ngo_id;
+                     INSERT INTO ngo_geo
+                         SELECT NEW.ngo_id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude
+                         WHERE NEW.verified = 1 AND NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL;
+                 END''')
+    
+    c.execute('''CREATE TRIGGER IF NOT EXISTS ngo_geo_delete AFTER DELETE ON ngo_profiles
+                 BEGIN
+                     DELETE FROM ngo_geo WHERE ngo_id = OLD.ngo_id;
+                 END''')
+    
+    c.execute("DELETE FROM ngo_geo")
+    c.execute('''INSERT INTO ngo_geo
+                 SELECT ngo_id, latitude, latitude, longitude, longitude
+                 FROM ngo_profiles
+                 WHERE verified = 1 AND latitude IS NOT NULL AND longitude IS NOT NULL''')
+
+
+
+def _add_qr_payload(conn):
+    # QR images are rendered on demand from this payload; qr_hash remains for older donations
+    c = conn.cursor()
+    add_column_if_missing(c, "donations", "qr_payload", "TEXT")
+
+
+def _create_expiry_schedule(conn):
+    # The expiry scheduler range-scans pending donations by expiry time and keeps its watermark here
+    c = conn.cursor()
+    c.execute("CREATE INDEX IF NOT EXISTS idx_donations_status_expiry ON donations (status, expiry_time)")
+    c.execute('''CREATE TABLE IF NOT EXISTS scheduler_state (
+        name TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    )''')
+
+
+def _create_match_suggestions(conn):
+    # Latest matching engine output; replaced wholesale on every run
+    c = conn.cursor()
+    c.execute('''CREATE TABLE IF NOT EXISTS match_suggestions (
+        donation_id INTEGER PRIMARY KEY,
+        ngo_id INTEGER NOT NULL,
+        distance_km REAL NOT NULL,
+        cost REAL NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (donation_id) REFERENCES donations(donation_id),
+        FOREIGN KEY (ngo_id) REFERENCES ngo_profiles(ngo_id)
+    )''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_match_suggestions_ngo ON match_suggestions (ngo_id, distance_km)")
+
+
+def _create_daily_rollups(conn):
+    # Per-day counts for the analytics and impact charts, kept current by triggers like platform_stats
+    c = conn.cursor()
+    
+    c.execute('''CREATE TABLE IF NOT EXISTS donation_daily (
+        day TEXT NOT NULL,
+        status TEXT NOT NULL,
+        food_type TEXT NOT NULL,
+        donations INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, status, food_type)
+    ) WITHOUT ROWID''')
+    
+    c.execute('''CREATE TABLE IF NOT EXISTS donor_daily (
+        donor_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        food_type TEXT NOT NULL,
+        donations INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (donor_id, day, food_type)
+    ) WITHOUT ROWID''')
+    
+    c.execute('''CREATE TABLE IF NOT EXISTS ngo_daily (
+        ngo_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        requests INTEGER NOT NULL DEFAULT 0,
+        completions INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (ngo_id, day)
+    ) WITHOUT ROWID''')
+    
+    # Donations count under the day they were posted, with their current status
+    def donation_rows(row, sign):
+        day = f"COALESCE(DATE({row}.created_at), 'unknown')"
+        food_type = f"COALESCE({row}.food_type, 'unknown')"
+        return (f"INSERT INTO donation_daily (day, status, food_type, donations) "
+                f"VALUES ({day}, COALESCE({row}.status, 'unknown'), {food_type}, {sign}) "
+                f"ON CONFLICT(day, status, food_type) DO UPDATE SET donations = donations + excluded.donations; "
+                f"INSERT INTO donor_daily (donor_id, day, food_type, donations) "
+                f"SELECT {row}.donor_id, {day}, {food_type}, {sign} WHERE {row}.donor_id IS NOT NULL "
+                f"ON CONFLICT(donor_id, day, food_type) DO UPDATE SET donations = donations + excluded.donations;")
+    
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS donation_daily_insert AFTER INSERT ON donations
+                  BEGIN
+                      {donation_rows("NEW", 1)}
+                  END''')
+    
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS donation_daily_update
+                  AFTER UPDATE OF status, food_type, created_at, donor_id ON donations
+                  WHEN OLD.status IS NOT NEW.status OR OLD.food_type IS NOT NEW.food_type
+                    OR OLD.created_at IS NOT NEW.created_at OR OLD.donor_id IS NOT NEW.donor_id
+                  BEGIN
+                      {donation_rows("OLD", -1)}
+                      {donation_rows("NEW", 1)}
+                  END''')
+    
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS donation_daily_delete AFTER DELETE ON donations
+                  BEGIN
+                      {donation_rows("OLD", -1)}
+                  END''')
+    
+    # Requests count under the day they were made, completions under the day they were collected
+    def ngo_rows(row, sign):
+        return (f"INSERT INTO ngo_daily (ngo_id, day, requests) "
+                f"SELECT {row}.ngo_id, COALESCE(DATE({row}.requested_at), 'unknown'), {sign} WHERE {row}.ngo_id IS NOT NULL "
+                f"ON CONFLICT(ngo_id, day) DO UPDATE SET requests = requests + excluded.requests; "
+                f"INSERT INTO ngo_daily (ngo_id, day, completions) "
+                f"SELECT {row}.ngo_id, COALESCE(DATE({row}.collected_at), 'unknown'), {sign} "
+                f"WHERE {row}.ngo_id IS NOT NULL AND {row}.status = 'completed' "
+                f"ON CONFLICT(ngo_id, day) DO UPDATE SET completions = completions + excluded.completions;")
+    
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS ngo_daily_insert AFTER INSERT ON requests
+                  BEGIN
+                      {ngo_rows("NEW", 1)}
+                  END''')
+    
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS ngo_daily_update
+                  AFTER UPDATE OF status, collected_at, requested_at, ngo_id ON requests
+                  WHEN OLD.status IS NOT NEW.status OR OLD.collected_at IS NOT NEW.collected_at
+                    OR OLD.requested_at IS NOT NEW.requested_at OR OLD.ngo_id IS NOT NEW.ngo_id
+                  BEGIN
+                      {ngo_rows("OLD", -1)}
+                      {ngo_rows("NEW", 1)}
+                  END''')
+    
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS ngo_daily_delete AFTER DELETE ON requests
+                  BEGIN
+                      {ngo_rows("OLD", -1)}
+                  END''')
+    
+    rebuild_daily_rollups(conn)
+
+
+def _create_leaderboards(conn):
+    # Completion counters updated with each collection, indexed for top-K reads, plus batch snapshots
+    c = conn.cursor()
+    
+    add_column_if_missing(c, "users", "completed_donations", "INTEGER DEFAULT 0")
+    c.execute('''UPDATE users SET completed_donations = (
+                     SELECT COUNT(*) FROM donations d WHERE d.donor_id = users.user_id AND d.status = 'completed'
+                 )''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_users_completed_donations ON users (completed_donations)")
+    # Weekly and monthly snapshots only look at recent collections
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_requests_collected ON requests (collected_at)
+                 WHERE status = 'completed' ''')
+    
+    c.execute('''CREATE TABLE IF NOT EXISTS leaderboard_snapshots (
+        board TEXT NOT NULL,
+        period TEXT NOT NULL,
+        rank INTEGER NOT NULL,
+        entity_id INTEGER NOT NULL,
+        name TEXT,
+        score INTEGER NOT NULL,
+        period_start TEXT,
+        computed_at TIMESTAMP NOT NULL,
+        PRIMARY KEY (board, period, rank)
+    ) WITHOUT ROWID''')
+
+
+def _backfill_streaks(conn):
+    # streak_days was never written before; later posts advance it incrementally
+    backfill_streaks(conn)
+
+# (version, description, step) -- append only, never renumber.
+# Steps must be idempotent: a database created before versioning, or a run
+# interrupted mid-step, replays them safely.
+MIGRATIONS = [
+    (1, "base tables", _create_base_tables),
+    (2, "donation geo index", _create_donation_geo_index),
+    (3, "blob store digests", _move_blobs_to_store),
+    (4, "hot path indexes", _create_hot_path_indexes),
+    (5, "donation full-text search", _create_donation_search_index),
+    (6, "platform stats counters", _create_platform_stats),
+    (7, "query cache data versions", _create_data_versions),
+    (8, "pagination indexes", _create_pagination_indexes),
+    (9, "notification outbox", _create_outbox),
+    (10, "ngo geo index", _create_ngo_geo_index),
+    (11, "qr payloads", _add_qr_payload),
+    (12, "expiry schedule", _create_expiry_schedule),
+    (13, "match suggestions", _create_match_suggestions),
+    (14, "daily rollups", _create_daily_rollups),
+    (15, "leaderboards", _create_leaderboards),
+    (16, "donation streak backfill", _backfill_streaks),
+]
+
+
+def add_column_if_missing(c, table, column, declaration):
+    c.execute(f"PRAGMA table_info({table})")
+    if column not in {row[1] for row in c.fetchall()}:
+        c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+
+def current_version(conn):
+    c = conn.cursor()
+    c.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+    return c.fetchone()[0]
+
+
+def migrate(conn):
+    """
+    Apply every migration newer than the recorded schema version
+    Returns the list of versions applied
+    """
+    c = conn.cursor()
+    c.execute('''CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''')
+    conn.commit()
+    
+    version = current_version(conn)
+    applied = []
+    
+    for step_version, description, step in MIGRATIONS:
+        if step_version <= version:
+            continue
+        step(conn)
+        c.execute("INSERT OR IGNORE INTO schema_migrations (version, description) VALUES (?, ?)",
+                  (step_version, description))
+        conn.commit()
+        applied.append(step_version)
+    
+    if applied:
+        c.execute("PRAGMA optimize")
+    
+    return applied
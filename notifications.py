@@ -0,0 +1,270 @@
+"""
+Notification Outbox
+Durable queue of email notifications, written in the same transaction as the
+state change that triggers them and drained by a background delivery worker
+
+Run standalone with: python notifications.py
+SMTP settings come from SMTP_SERVER, SMTP_PORT, SMTP_EMAIL and SMTP_PASSWORD
+New-donation alerts reach verified NGOs within ALERT_RADIUS_KM (default 25)
+"""
+
+import json
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from database import PeriodicWorker
+from email_service import EmailService
+from geo import bounding_box
+
+ALERT_RADIUS_KM = float(os.environ.get('ALERT_RADIUS_KM', 25))
+
+# Delivery threads per outbox worker; its EmailService keeps one pooled SMTP session for each
+OUTBOX_THREADS = 4
+
+# Rough number of meals one donation feeds, used to weigh open pickups against NGO capacity
+MEALS_PER_DONATION = 15
+
+# Pickups counted against NGO n's daily capacity: requests accepted or collected
+# since the day start bound to ?, plus claims still waiting on a live donation.
+# A pending request stops counting once its donation expires or goes to another NGO
+PICKUPS_TODAY_SQL = '''SELECT COUNT(*) FROM requests r
+                       JOIN donations d ON d.donation_id = r.donation_id
+                       WHERE r.ngo_id = n.ngo_id
+                         AND ((r.status = 'pending' AND d.status = 'pending')
+                              OR (r.status = 'accepted' AND r.accepted_at >= ?)
+                              OR (r.status = 'completed' AND r.collected_at >= ?))'''
+
+
+def pickup_slots_sql(capacity):
+    """
+    SQL for the pickups a daily capacity in meals allows, rounded up so that any
+    NGO able to take food at all gets at least one slot
+    """
+    return f"MAX(1, (CAST({capacity} AS INTEGER) + {MEALS_PER_DONATION - 1}) / {MEALS_PER_DONATION})"
+
+
+def enqueue(conn, method, **kwargs):
+    """
+    Queue a call to EmailService.<method>(**kwargs)
+    Does not commit: the row becomes visible with the caller's transaction
+    """
+    conn.execute("INSERT INTO outbox (method, payload) VALUES (?, ?)",
+                 (method, json.dumps(kwargs, default=str)))
+
+
+def enqueue_many(conn, calls):
+    """
+    Queue several (method, kwargs) calls with one executemany
+    """
+    conn.executemany("INSERT INTO outbox (method, payload) VALUES (?, ?)",
+                     [(method, json.dumps(kwargs, default=str)) for method, kwargs in calls])
+
+
+def nearby_ngos_with_capacity(conn, lat, lon, radius_km=ALERT_RADIUS_KM):
+    """
+    Verified NGOs within radius_km of (lat, lon) that can take one more pickup today
+    Returns (ngo_id, email, distance_km) rows, nearest first
+    """
+    today = datetime.now().strftime('%Y-%m-%d')
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+    c = conn.cursor()
+    # ngo_geo narrows the search to the bounding box; the distance check trims its corners
+    c.execute(f'''SELECT n.ngo_id, u.email, haversine_km(?, ?, n.latitude, n.longitude) AS distance
+                 FROM ngo_geo g
+                 JOIN ngo_profiles n ON n.ngo_id = g.ngo_id
+                 JOIN users u ON u.user_id = n.user_id
+                 WHERE g.min_lat >= ? AND g.max_lat <= ? AND g.min_lon >= ? AND g.max_lon <= ?
+                   AND distance <= ?
+                   AND (n.capacity IS NULL OR {pickup_slots_sql("n.capacity")} > ({PICKUPS_TODAY_SQL}))
+                 ORDER BY distance''',
+              (lat, lon, min_lat, max_lat, min_lon, max_lon, radius_km, today, today))
+    return c.fetchall()
+
+
+def donation_alert(conn, details, lat, lon, radius_km=ALERT_RADIUS_KM):
+    """
+    The outbox call alerting every nearby NGO with spare capacity to one
+    donation, or None when there are none
+    Returns (call, number of NGOs it reaches)
+    """
+    ngos = nearby_ngos_with_capacity(conn, lat, lon, radius_km)
+    if not ngos:
+        return None, 0
+    return ('send_donation_posted_alert',
+            {'ngo_emails': [email for _, email, _ in ngos], 'donation_details': details}), len(ngos)
+
+
+def queue_donation_alerts(conn, donation_id, radius_km=ALERT_RADIUS_KM):
+    """
+    Queue a new-donation alert for every nearby NGO with spare capacity
+    The whole wave is one outbox row, sent from one shared message; NGOs it
+    could not reach are retried on their own
+    Does not commit; returns the number of NGOs alerted
+    """
+    c = conn.cursor()
+    c.execute('''SELECT food_name, quantity, location, expiry_time, latitude, longitude
+                 FROM donations WHERE donation_id = ?''', (donation_id,))
+    food_name, quantity, location, expiry_time, lat, lon = c.fetchone()
+
+    details = {'food_name': food_name, 'quantity': quantity, 'location': location, 'expiry_time': expiry_time}
+    call, alerted = donation_alert(conn, details, lat, lon, radius_km)
+    if call:
+        enqueue_many(conn, [call])
+    return alerted
+
+
+def outbox_counts(conn):
+    """
+    Number of outbox rows in each status
+    """
+    c = conn.cursor()
+    c.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status")
+    return dict(c.fetchall())
+
+
+def retry_dead_letters(conn):
+    """
+    Put dead-lettered notifications back in the queue with a fresh attempt budget
+    """
+    c = conn.cursor()
+    c.execute('''UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = CURRENT_TIMESTAMP
+                 WHERE status = 'dead' ''')
+    conn.commit()
+    return c.rowcount
+
+
+def email_service_from_env(pool_size=OUTBOX_THREADS):
+    """
+    EmailService configured from the SMTP_* environment variables
+    pool_size should be at least the number of threads sending through it,
+    or sessions beyond the pool are closed after every batch
+    """
+    return EmailService(
+        smtp_server=os.environ.get('SMTP_SERVER', 'smtp.gmail.com'),
+        smtp_port=int(os.environ.get('SMTP_PORT', 587)),
+        email=os.environ.get('SMTP_EMAIL'),
+        password=os.environ.get('SMTP_PASSWORD'),
+        pool_size=pool_size,
+    )
+
+
+class OutboxWorker(PeriodicWorker):
+    name = "outbox-worker"
+
+    def __init__(self, pool, email_service, threads=OUTBOX_THREADS, batch_size=50, max_attempts=6,
+                 base_delay=30, max_delay=3600, poll_interval=2.0, lease_seconds=600):
+        """
+        Initialize outbox worker
+        Failed deliveries are retried after base_delay * 2^(attempt - 1) seconds
+        (capped at max_delay, with jitter) and dead-lettered after max_attempts.
+        Rows claimed by a worker that died are reclaimed after lease_seconds
+        """
+        super().__init__(pool, poll_interval)
+        self.email_service = email_service
+        self.threads = threads
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease_seconds = lease_seconds
+        self._executor = None
+
+    def claim_batch(self):
+        """
+        Atomically mark up to batch_size due rows as 'sending' and return them
+        """
+        with self.pool.connection() as conn:
+            c = conn.cursor()
+            # Take the write lock up front so two workers never claim the same rows
+            c.execute("BEGIN IMMEDIATE")
+            c.execute('''SELECT outbox_id, method, payload, attempts FROM outbox
+                         WHERE (status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP)
+                            OR (status = 'sending' AND claimed_at <= datetime('now', ?))
+                         ORDER BY next_attempt_at
+                         LIMIT ?''', (f"-{int(self.lease_seconds)} seconds", self.batch_size))
+            rows = c.fetchall()
+            c.executemany("UPDATE outbox SET status = 'sending', claimed_at = CURRENT_TIMESTAMP WHERE outbox_id = ?",
+                          [(row[0],) for row in rows])
+            conn.commit()
+        return rows
+
+    def deliver(self, row):
+        """
+        Make the queued EmailService call
+        Returns None on success, or (error, payload) where payload is what a
+        retry should send -- narrowed when only some recipients failed
+        """
+        _, method, payload, _ = row
+        kwargs = json.loads(payload)
+        try:
+            result = getattr(self.email_service, method)(**kwargs)
+        except Exception as e:
+            return f"{type(e).__name__}: {e}", payload
+        # Multi-recipient sends return the arguments that still need sending
+        if isinstance(result, dict):
+            return "some recipients failed", json.dumps(dict(kwargs, **result), default=str)
+        # send_* methods report failure as False or a zero sent count
+        if result is False or result == 0:
+            return "delivery failed", payload
+        return None
+
+    def retry_delay(self, attempts):
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay * random.uniform(0.8, 1.2)
+
+    def record_results(self, rows, errors):
+        sent, retries, dead = [], [], []
+        for (outbox_id, _, _, attempts), outcome in zip(rows, errors):
+            if outcome is None:
+                sent.append((outbox_id,))
+                continue
+            error, payload = outcome
+            if attempts + 1 >= self.max_attempts:
+                dead.append((error, payload, outbox_id))
+            else:
+                retries.append((error, payload, f"+{int(self.retry_delay(attempts + 1))} seconds", outbox_id))
+
+        with self.pool.connection() as conn:
+            c = conn.cursor()
+            c.executemany('''UPDATE outbox SET status = 'sent', attempts = attempts + 1, sent_at = CURRENT_TIMESTAMP
+                             WHERE outbox_id = ?''', sent)
+            c.executemany('''UPDATE outbox SET status = 'pending', attempts = attempts + 1, last_error = ?, payload = ?,
+                                    next_attempt_at = datetime('now', ?)
+                             WHERE outbox_id = ?''', retries)
+            c.executemany('''UPDATE outbox SET status = 'dead', attempts = attempts + 1, last_error = ?, payload = ?
+                             WHERE outbox_id = ?''', dead)
+            conn.commit()
+
+    def run_once(self, executor=None):
+        """
+        Claim and deliver one batch; returns the number of rows processed
+        """
+        # Without SMTP credentials every send "fails"; leave rows queued instead of dead-lettering them
+        if not self.email_service.enabled:
+            return 0
+        rows = self.claim_batch()
+        if rows:
+            if executor is None:
+                errors = [self.deliver(row) for row in rows]
+            else:
+                errors = list(executor.map(self.deliver, rows))
+            self.record_results(rows, errors)
+        return len(rows)
+
+    def step(self):
+        # Keep draining while there is a backlog, otherwise poll
+        return self.run_once(self._executor) >= self.batch_size
+
+    def run_forever(self):
+        with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="outbox") as self._executor:
+            super().run_forever()
+
+
+if __name__ == "__main__":
+    email_service = email_service_from_env()
+    if not email_service.enabled:
+        raise SystemExit("SMTP_EMAIL and SMTP_PASSWORD are not set; notifications stay queued")
+
+    OutboxWorker.run_standalone(email_service)
@@ -0,0 +1,75 @@
+"""
+Donation QR Codes
+Donations store only their QR payload string; the PNG is rendered the first
+time someone views or downloads it and kept in a bounded LRU by donation ID
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from io import BytesIO
+
+import qrcode
+
+
+def new_payload(donor_id):
+    return f"DONATION-{datetime.now().strftime('%Y%m%d%H%M%S')}-{donor_id}"
+
+
+def render_png(payload):
+    qr = qrcode.QRCode(version=1, box_size=10, border=5)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+
+    buffered = BytesIO()
+    img.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+class QRCodeCache:
+    def __init__(self, max_entries=256):
+        """
+        Initialize QR cache
+        Entries remember the payload they were rendered from, so a
+        regenerated payload is never served a stale image
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def png(self, donation_id, payload):
+        """
+        PNG bytes for a donation's QR code, rendering it on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(donation_id)
+            if entry is not None and entry[0] == payload:
+                self._entries.move_to_end(donation_id)
+                return entry[1]
+
+        png = render_png(payload)
+
+        with self._lock:
+            self._entries[donation_id] = (payload, png)
+            self._entries.move_to_end(donation_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return png
+
+    def invalidate(self, donation_id):
+        with self._lock:
+            self._entries.pop(donation_id, None)
+
+
+def regenerate_payload(conn, donation_id, donor_id):
+    """
+    Issue a fresh QR payload for a donation, replacing any legacy stored PNG
+    Returns the new payload
+    """
+    payload = new_payload(donor_id)
+    conn.execute("UPDATE donations SET qr_payload = ?, qr_hash = NULL WHERE donation_id = ?",
+                 (payload, donation_id))
+    conn.commit()
+    return payload
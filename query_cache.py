@@ -0,0 +1,84 @@
+"""
+Query Cache
+Result cache for read-only dashboard queries, keyed on the SQL, its parameters
+and the data version of every table it reads
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class QueryCache:
+    def __init__(self, max_entries=512):
+        """
+        Initialize query cache
+        Table versions are bumped by triggers on every write, so an entry is
+        never served once any table it depends on has changed
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def fetchall(self, conn, sql, params=(), tables=()):
+        """
+        Return cached rows for sql/params, running the query on a miss
+        tables must list every table the query reads
+        """
+        key = (sql, tuple(params), table_versions(conn, tables))
+
+        with self._lock:
+            rows = self._entries.get(key)
+            if rows is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return list(rows)
+            self.misses += 1
+
+        rows = tuple(conn.execute(sql, params).fetchall())
+
+        with self._lock:
+            # Superseded versions of this query are never hit again and age out here
+            self._entries[key] = rows
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return list(rows)
+
+    def stats(self):
+        """
+        Hit/miss counters for display
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        """
+        Drop every entry and reset the counters
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+def table_versions(conn, tables):
+    """
+    Current data version of each table, in the order given
+    """
+    if not tables:
+        return ()
+
+    placeholders = ",".join("?" * len(tables))
+    c = conn.cursor()
+    c.execute(f"SELECT table_name, version FROM data_versions WHERE table_name IN ({placeholders})", tuple(tables))
+    versions = dict(c.fetchall())
+    return tuple((table, versions.get(table, 0)) for table in tables)
@@ -0,0 +1,98 @@
+"""
+Pickup Route Planning
+Orders an NGO's accepted pickups into a round trip from its base using
+nearest-neighbour and earliest-deadline starts refined by 2-opt, treating
+each donation's expiry time as a deadline
+"""
+
+import numpy as np
+
+from geo import haversine_matrix_km
+from matching import PICKUP_SPEED_KMH
+
+# Time spent loading at each stop before driving on
+SERVICE_MINUTES = 10
+
+
+def _arrivals(path, distance, speed_kmh, service_hours):
+    """
+    Hours from departure until reaching each stop on path (base first, base last)
+    """
+    legs = distance[path[:-1], path[1:]]
+    return np.cumsum(legs)[:-1] / speed_kmh + service_hours * np.arange(len(path) - 2)
+
+
+def _score(path, distance, deadlines, speed_kmh, service_hours):
+    """
+    (hours late summed over all stops, round-trip km); lower is better in that order
+    """
+    late = np.maximum(0.0, _arrivals(path, distance, speed_kmh, service_hours) - deadlines[path[1:-1] - 1]).sum()
+    return round(float(late), 6), float(distance[path[:-1], path[1:]].sum())
+
+
+def _nearest_neighbour(distance):
+    n = distance.shape[0]
+    path, unvisited = [0], set(range(1, n))
+    while unvisited:
+        here = path[-1]
+        path.append(min(unvisited, key=lambda stop: distance[here, stop]))
+        unvisited.remove(path[-1])
+    return np.array(path + [0])
+
+
+def _two_opt(path, distance, deadlines, speed_kmh, service_hours):
+    """
+    Reverse segments while that cuts lateness, or shortens the trip without adding lateness
+    Move gains for every segment are computed at once; candidates are tried
+    shortest-trip first and the first that scores better is applied
+    """
+    best = _score(path, distance, deadlines, speed_kmh, service_hours)
+    n = len(path) - 2
+    i, j = np.triu_indices(n, k=1)
+    i, j = i + 1, j + 1
+
+    while True:
+        edge = distance[path[:-1], path[1:]]
+        # Reversing path[i..j] swaps edges (i-1, i) and (j, j+1) for (i-1, j) and (i, j+1)
+        gain = edge[i - 1] + edge[j] - distance[path[i - 1], path[j]] - distance[path[i], path[j + 1]]
+
+        improved = False
+        for k in np.argsort(-gain):
+            # Once on time, only shorter routes can win; while late, a longer one may cut lateness
+            if gain[k] <= 1e-9 and best[0] == 0:
+                break
+            candidate = path.copy()
+            candidate[i[k]:j[k] + 1] = candidate[i[k]:j[k] + 1][::-1]
+            score = _score(candidate, distance, deadlines, speed_kmh, service_hours)
+            if score < best:
+                path, best, improved = candidate, score, True
+                break
+        if not improved:
+            return path
+
+
+def plan_route(base, stops, deadlines_hours=None, speed_kmh=PICKUP_SPEED_KMH, service_minutes=SERVICE_MINUTES):
+    """
+    Visit order for a round trip from base (lat, lon) through every stop (lat, lon)
+    deadlines_hours gives, per stop, the hours from departure until it expires
+    Returns (order, total_km, arrival_hours): order indexes into stops and
+    arrival_hours[k] is the estimated arrival at the k-th stop visited
+    """
+    if not stops:
+        return [], 0.0, []
+
+    points = np.array([base] + list(stops), dtype=float)
+    distance = haversine_matrix_km(points[:, 0], points[:, 1], points[:, 0], points[:, 1])
+    deadlines = (np.full(len(stops), np.inf) if deadlines_hours is None
+                 else np.asarray(deadlines_hours, dtype=float))
+    service_hours = service_minutes / 60
+
+    # Start from whichever of nearest-neighbour and earliest-deadline-first scores better
+    by_deadline = np.concatenate([[0], np.argsort(deadlines, kind='stable') + 1, [0]])
+    starts = [_nearest_neighbour(distance), by_deadline]
+    path = min(starts, key=lambda p: _score(p, distance, deadlines, speed_kmh, service_hours))
+    path = _two_opt(path, distance, deadlines, speed_kmh, service_hours)
+
+    total_km = float(distance[path[:-1], path[1:]].sum())
+    arrivals = _arrivals(path, distance, speed_kmh, service_hours)
+    return [int(stop) - 1 for stop in path[1:-1]], total_km, [float(hours) for hours in arrivals]
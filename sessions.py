@@ -0,0 +1,176 @@
+"""
+Session Store
+Server-side login sessions keyed by signed tokens, caching each user's
+resolved identity (user row, NGO profile and badges) between reruns
+
+Tokens are signed with SESSION_SECRET; without it a random per-process
+secret is used and sessions end when the server restarts
+"""
+
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+
+DEFAULT_TTL_SECONDS = 12 * 3600
+
+
+def _today():
+    # Local calendar date, as load_identity uses to decide whether a streak is current
+    return time.strftime('%Y-%m-%d')
+
+
+def badges_for(total_donations, streak_days):
+    """
+    (icon, label, css class) badges earned for a donor's totals
+    """
+    total, streak = total_donations or 0, streak_days or 0
+    badges = []
+
+    if total >= 50:
+        badges.append(("🏆", "Gold Donor", "badge-gold"))
+    elif total >= 20:
+        badges.append(("🥈", "Silver Donor", "badge-silver"))
+    elif total >= 5:
+        badges.append(("🥉", "Bronze Donor", "badge-bronze"))
+
+    if streak >= 7:
+        badges.append(("🔥", f"{streak} Day Streak", "badge-gold"))
+
+    return badges
+
+
+def load_identity(conn, user_id):
+    """
+    Resolve everything the dashboards need about a user in one query
+    Returns None if the user no longer exists
+    """
+    c = conn.cursor()
+    # A streak only counts while it can still be extended, i.e. the last post was today or yesterday
+    c.execute('''SELECT u.user_id, u.full_name, u.role, u.verified, u.email, u.total_donations,
+                        CASE WHEN u.last_donation_date >= DATE('now', 'localtime', '-1 day') THEN u.streak_days ELSE 0 END,
+                        n.ngo_id, n.organization_name, n.verified, n.total_pickups, n.latitude, n.longitude
+                 FROM users u
+                 LEFT JOIN ngo_profiles n ON n.user_id = u.user_id
+                 WHERE u.user_id = ?''', (user_id,))
+    row = c.fetchone()
+    if row is None:
+        return None
+
+    return {
+        'user_id': row[0],
+        'name': row[1],
+        'role': row[2],
+        'verified': row[3],
+        'email': row[4],
+        'badges': badges_for(row[5], row[6]),
+        # (ngo_id, organization_name, verified, total_pickups, latitude, longitude), or None before the profile is filled in
+        'ngo_profile': row[7:13] if row[7] is not None else None,
+    }
+
+
+class SessionStore:
+    def __init__(self, secret=None, ttl_seconds=DEFAULT_TTL_SECONDS, max_sessions=10000):
+        """
+        Initialize session store
+        Sessions expire ttl_seconds after login; once more than max_sessions
+        are held, expired ones are swept on the next login
+        """
+        secret = secret or os.environ.get('SESSION_SECRET') or secrets.token_hex(32)
+        self.secret = secret.encode() if isinstance(secret, str) else secret
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        # session id -> [user_id, expires_at, identity or None when stale, local date it was resolved]
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _sign(self, payload):
+        return hmac.new(self.secret, payload.encode(), hashlib.sha256).hexdigest()
+
+    def _parse(self, token):
+        """
+        Session id of a correctly signed, unexpired token, else None
+        """
+        try:
+            session_id, expires_at, signature = token.split(".")
+            expires_at = int(expires_at)
+        except (AttributeError, ValueError):
+            return None
+        if not hmac.compare_digest(signature, self._sign(f"{session_id}.{expires_at}")):
+            return None
+        if expires_at <= time.time():
+            return None
+        return session_id
+
+    def create(self, conn, user_id):
+        """
+        Start a session for user_id and return its token
+        """
+        session_id = secrets.token_urlsafe(24)
+        expires_at = int(time.time() + self.ttl_seconds)
+        identity = load_identity(conn, user_id)
+
+        with self._lock:
+            if len(self._sessions) >= self.max_sessions:
+                now = time.time()
+                self._sessions = {sid: entry for sid, entry in self._sessions.items() if entry[1] > now}
+            self._sessions[session_id] = [user_id, expires_at, identity, _today()]
+
+        return f"{session_id}.{expires_at}.{self._sign(f'{session_id}.{expires_at}')}"
+
+    def get(self, conn, token):
+        """
+        Identity for a session token, or None if it is invalid, expired or revoked
+        Served from memory unless the user was invalidated since the last call
+        or the date has changed, since a streak's badge lapses at midnight
+        """
+        session_id = self._parse(token)
+        if session_id is None:
+            return None
+
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            user_id, _, identity, resolved_on = entry
+        today = _today()
+        if identity is not None and resolved_on == today:
+            return identity
+
+        identity = load_identity(conn, user_id)
+        with self._lock:
+            if identity is None:
+                self._sessions.pop(session_id, None)
+            elif session_id in self._sessions:
+                self._sessions[session_id][2:] = [identity, today]
+        return identity
+
+    def invalidate_user(self, user_id):
+        """
+        Re-resolve user_id's identity on its sessions' next request
+        Call after committing any change to the user's row, NGO profile or badges
+        """
+        with self._lock:
+            for entry in self._sessions.values():
+                if entry[0] == user_id:
+                    entry[2] = None
+
+    def invalidate_all(self):
+        """
+        Re-resolve every session's identity on its next request
+        Call after a bulk change such as recomputing streaks for all users
+        """
+        with self._lock:
+            for entry in self._sessions.values():
+                entry[2] = None
+
+    def revoke(self, token):
+        """
+        End the session for token
+        """
+        session_id = self._parse(token)
+        if session_id is not None:
+            with self._lock:
+                self._sessions.pop(session_id, None)
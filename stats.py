@@ -0,0 +1,82 @@
+"""
+Platform Statistics
+O(1) platform counters and per-day rollups kept current by triggers, plus
+repair jobs that recompute them from the base tables
+"""
+
+from collections import defaultdict
+
+# Counter names:
+#   donations_total, donations_<status>   -- donations by current status
+#   users_<role>                          -- registered users by role
+#   verified_ngos                         -- NGO profiles approved by an admin
+
+
+def get_platform_stats(conn):
+    """
+    Read every counter; missing counters read as 0
+    """
+    c = conn.cursor()
+    c.execute("SELECT stat, value FROM platform_stats")
+    return defaultdict(int, c.fetchall())
+
+
+def rebuild_platform_stats(conn):
+    """
+    Recompute all counters from the base tables in one transaction
+    """
+    c = conn.cursor()
+    c.execute("DELETE FROM platform_stats")
+    c.execute("INSERT INTO platform_stats (stat, value) SELECT 'donations_total', COUNT(*) FROM donations")
+    c.execute('''INSERT INTO platform_stats (stat, value)
+                 SELECT 'donations_' || COALESCE(status, 'unknown'), COUNT(*) FROM donations
+                 GROUP BY COALESCE(status, 'unknown')''')
+    c.execute('''INSERT INTO platform_stats (stat, value)
+                 SELECT 'users_' || COALESCE(role, 'unknown'), COUNT(*) FROM users
+                 GROUP BY COALESCE(role, 'unknown')''')
+    c.execute("INSERT INTO platform_stats (stat, value) SELECT 'verified_ngos', COUNT(*) FROM ngo_profiles WHERE verified = 1")
+    conn.commit()
+
+
+def rebuild_daily_rollups(conn):
+    """
+    Recompute donation_daily, donor_daily and ngo_daily from the base tables
+    in one transaction, dropping rows that have fallen to zero
+    """
+    c = conn.cursor()
+    c.execute("DELETE FROM donation_daily")
+    c.execute('''INSERT INTO donation_daily (day, status, food_type, donations)
+                 SELECT COALESCE(DATE(created_at), 'unknown'), COALESCE(status, 'unknown'),
+                        COALESCE(food_type, 'unknown'), COUNT(*)
+                 FROM donations
+                 GROUP BY 1, 2, 3''')
+    c.execute("DELETE FROM donor_daily")
+    c.execute('''INSERT INTO donor_daily (donor_id, day, food_type, donations)
+                 SELECT donor_id, COALESCE(DATE(created_at), 'unknown'), COALESCE(food_type, 'unknown'), COUNT(*)
+                 FROM donations
+                 WHERE donor_id IS NOT NULL
+                 GROUP BY 1, 2, 3''')
+    c.execute("DELETE FROM ngo_daily")
+    c.execute('''INSERT INTO ngo_daily (ngo_id, day, requests)
+                 SELECT ngo_id, COALESCE(DATE(requested_at), 'unknown'), COUNT(*)
+                 FROM requests
+                 WHERE ngo_id IS NOT NULL
+                 GROUP BY 1, 2''')
+    c.execute('''INSERT INTO ngo_daily (ngo_id, day, completions)
+                 SELECT ngo_id, COALESCE(DATE(collected_at), 'unknown'), COUNT(*)
+                 FROM requests
+                 WHERE ngo_id IS NOT NULL AND status = 'completed'
+                 GROUP BY 1, 2
+                 ON CONFLICT(ngo_id, day) DO UPDATE SET completions = excluded.completions''')
+    conn.commit()
+
+
+if __name__ == "__main__":
+    from database import ConnectionPool
+    from migrations import migrate
+
+    with ConnectionPool().connection() as conn:
+        migrate(conn)
+        rebuild_platform_stats(conn)
+        rebuild_daily_rollups(conn)
+        print(dict(get_platform_stats(conn)))